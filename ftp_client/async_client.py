@@ -0,0 +1,507 @@
+"""
+FTP Async Client module.
+
+This module provides a native asyncio FTP client. Its control and data connections are
+asyncio streams, so many sessions and transfers are multiplexed on one event loop instead
+of occupying a thread each.
+"""
+import asyncio
+import os
+
+from ftp_client.connect import CONNECT_DELAY, Connection, ReplyFramer
+from ftp_client.listing import parse_list_line, parse_mlsx_line
+from ftp_client.transfer import DEFAULT_BLOCK_SIZE
+
+
+class AsyncConnection:
+    """
+    Represents an asyncio control connection to an FTP server.
+
+    Unlike `Connection`, a reply timeout closes only this connection and is reported as a
+    missing reply, since exiting would stop every other session on the event loop.
+
+    :ivar timeout (float): How long to wait for a reply or a connection, in seconds.
+    """
+
+    PORT = 21
+    # The longest line a stream reads, well above asyncio's 64 KiB default, since listing
+    # and reply lines carry names of any length.
+    LINE_LIMIT = 1024 * 1024
+
+    def __init__(self, timeout: float = 20.0):
+        """
+        Initializes the FTP connection.
+        """
+        self.host = None
+        self.timeout = timeout
+        self.connected = False
+        self._reader = None
+        self._writer = None
+
+    async def connect(self, host: str, port: int = PORT):
+        """
+        Connects to the FTP server, at whichever of its addresses answers first.
+
+        :param host: The hostname or IP address of the FTP server.
+        :param port: The port of the FTP server.
+
+        :return: The response code if successful, or False if the connection fails.
+        """
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, happy_eyeballs_delay=CONNECT_DELAY,
+                                        limit=self.LINE_LIMIT),
+                self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        self.host = self._writer.get_extra_info('peername')[0]
+        response = await self.get_response()
+        if not response:
+            return False
+        self.connected = True
+        return response['code']
+
+    async def close(self) -> None:
+        """
+        Closes the connection to the server.
+        """
+        self.connected = False
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+            self._writer = None
+
+    async def send_request(self, request: str) -> None:
+        """
+        Sends a request to the server.
+        """
+        self._writer.write(f'{request.strip()}\r\n'.encode())
+        await self._writer.drain()
+
+    async def get_response(self):
+        """
+        Receives one complete reply from the server.
+
+        :return: The parsed reply like `Connection.get_response`, or False if the server
+                 closed the connection or did not reply in time.
+        """
+        try:
+            lines = await asyncio.wait_for(self._read_reply(), self.timeout)
+        except (OSError, ValueError, asyncio.TimeoutError):
+            # ValueError: a line beyond LINE_LIMIT, the rest of the reply cannot be framed.
+            lines = None
+        if lines is None:
+            await self.close()
+            return False
+        return Connection._parse_response('\r\n'.join(lines))
+
+    async def open_data_stream(self):
+        """
+        Opens a passive data connection, with EPSV over IPv6 since PASV is IPv4 only.
+
+        :return: The (reader, writer) pair of the data connection, or None if it could not
+                 be opened.
+        """
+        epsv = ':' in self.host
+        await self.send_request('EPSV' if epsv else 'PASV')
+        response = await self.get_response()
+        if not response or response['code'] != ('229' if epsv else '227'):
+            return None
+        try:
+            params = response['message'].split('(')[1].split(')')[0]
+            if epsv:
+                port = int(params.split(params[0])[3])
+            else:
+                params = params.split(',')
+                port = (int(params[4]) * 256) + int(params[5])
+            return await asyncio.wait_for(
+                asyncio.open_connection(self.host, port, limit=self.LINE_LIMIT), self.timeout)
+        except (IndexError, ValueError, OSError, asyncio.TimeoutError):
+            return None
+
+    async def _read_reply(self):
+        """
+        Reads a single reply, see `ReplyFramer`.
+
+        :return: The list of reply lines, or None if the server closed the connection.
+        """
+        framer = ReplyFramer()
+        while True:
+            line = await self._read_line()
+            if line is None:
+                return None
+            if framer.add(line):
+                return framer.lines
+
+    async def _read_line(self):
+        """
+        Returns the next line from the control channel without its line terminator,
+        or None if the server closed the connection.
+        """
+        line = await self._reader.readline()
+        if not line:
+            return None
+        return line.rstrip(b'\r\n').decode('utf-8', errors='replace')
+
+
+class AsyncFtpClient:
+    """
+    A native asyncio FTP client.
+
+    One client is one FTP session and runs one transfer at a time. Directory transfers
+    open `workers` further sessions on the same event loop, see `download_directory`.
+
+    :ivar connection (AsyncConnection): The control connection.
+    :ivar logged_in (bool): Whether the client is logged in to the server.
+    :ivar block_size (int): The buffer size used for data transfers.
+    """
+
+    def __init__(self, block_size: int = DEFAULT_BLOCK_SIZE, timeout: float = 20.0):
+        """
+        Initializes a new, not yet connected client.
+
+        :param block_size: The buffer size used for data transfers.
+        :param timeout: How long to wait for a reply or a data block, in seconds.
+        """
+        self.connection = AsyncConnection(timeout)
+        self.logged_in = False
+        self.block_size = block_size
+        self.host = None
+        self.user = None
+        self._password = None
+        self._port = AsyncConnection.PORT
+        self._mlsd_supported = None
+        self._last_response = None
+        self._offset = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def login(self, host: str, user: str, password: str,
+                    port: int = AsyncConnection.PORT) -> bool:
+        """
+        Connects to the specified FTP server and authenticates.
+
+        :param host: The hostname or IP address of the FTP server.
+        :param user: The username to authenticate with.
+        :param password: The password to authenticate with.
+        :param port: The port of the FTP server.
+
+        :return: True if the client is logged in, False otherwise
+        """
+        if await self.connection.connect(host, port) != '220':
+            print(f"Error: Invalid hostname or IP address ({host}).")
+            return False
+        await self.connection.send_request('USER ' + user)
+        response = await self.connection.get_response()
+        if response and response['code'] == '331':
+            await self.connection.send_request('PASS ' + password)
+            response = await self.connection.get_response()
+        if not response or response['code'] != '230':
+            print("Error: Invalid username or password.")
+            await self.connection.close()
+            return False
+        await self.connection.send_request('TYPE I')
+        await self.connection.get_response()
+        self.logged_in = True
+        self.host = host
+        self.user = user
+        self._password = password
+        self._port = port
+        return True
+
+    async def close(self) -> None:
+        """
+        Closes the connection to the FTP server.
+        """
+        if self.connection.connected:
+            try:
+                await self.connection.send_request('QUIT')
+                await self.connection.get_response()
+            except OSError:
+                pass
+        await self.connection.close()
+        self.logged_in = False
+
+    async def iter_lines(self, command: str):
+        """
+        Sends a listing command and yields the lines of its data connection as they arrive.
+
+        :param command: The listing command with its argument, e.g. "LIST /dir".
+        """
+        stream = await self._open_transfer(command)
+        if stream is not None:
+            async for line in self._read_lines(stream):
+                yield line
+
+    async def _read_lines(self, stream):
+        """
+        Yields the non-empty lines of a data connection as they arrive, then closes it and
+        reads the final reply.
+        """
+        reader, writer = stream
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.connection.timeout)
+                except ValueError:
+                    print('Error: A listing line is longer than '
+                          f'{AsyncConnection.LINE_LIMIT} bytes.')
+                    break
+                if not line:
+                    break
+                line = line.rstrip(b'\r\n')
+                if line:
+                    yield line.decode('utf-8', errors='replace')
+        finally:
+            writer.close()
+            await self.connection.get_response()
+
+    async def list(self, directory: str = '') -> list:
+        """
+        Lists a directory with LIST.
+
+        :param directory: The name of the directory to list (default is the current directory).
+
+        :return: A list of strings representing the contents of the directory.
+        """
+        return [line async for line in self.iter_lines('LIST ' + directory)]
+
+    async def entries(self, directory: str = '') -> list:
+        """
+        Lists a directory as typed entries, with MLSD where the server supports it and by
+        parsing LIST otherwise.
+
+        :param directory: The name of the directory to list (default is the current directory).
+
+        :return: A list of FtpEntry.
+        """
+        result = []
+        if self._mlsd_supported is not False:
+            stream = await self._open_transfer('MLSD ' + directory)
+            if stream is not None:
+                self._mlsd_supported = True
+                async for line in self._read_lines(stream):
+                    entry = parse_mlsx_line(line)
+                    if entry and entry.type not in ('cdir', 'pdir'):
+                        result.append(entry)
+                return result
+            if self._last_response and self._last_response['code'] in ('500', '502'):
+                self._mlsd_supported = False
+        for line in await self.list(directory):
+            entry = parse_list_line(line)
+            if entry and entry.name not in ('.', '..'):
+                result.append(entry)
+        return result
+
+    async def download_file(self, remote_file: str, local_file: str,
+                            resume: bool = False) -> bool:
+        """
+        Downloads a single file from the remote server to the local machine.
+
+        :param remote_file: file to download from the server
+        :param local_file: file to save on the local machine
+        :param resume: whether to continue an existing partial local file with REST
+        :return: True if the file was downloaded successfully, False otherwise
+        """
+        offset = os.path.getsize(local_file) if resume and os.path.isfile(local_file) else 0
+        stream = await self._open_transfer('RETR ' + remote_file, offset)
+        if stream is None:
+            print(f'Error: Could not download the file {remote_file}.')
+            return False
+        reader, writer = stream
+        loop = asyncio.get_running_loop()
+        try:
+            with open(local_file, 'r+b' if self._offset else 'wb') as file:
+                file.seek(self._offset)
+                while True:
+                    chunk = await asyncio.wait_for(reader.read(self.block_size),
+                                                   self.connection.timeout)
+                    if not chunk:
+                        break
+                    # Disk writes run on the default executor, so a slow disk does not
+                    # stall the other sessions on the event loop.
+                    await loop.run_in_executor(None, file.write, chunk)
+        except (OSError, asyncio.TimeoutError):
+            writer.close()
+            await self.connection.get_response()
+            print(f'Error: Could not download the file {remote_file}.')
+            return False
+        writer.close()
+        response = await self.connection.get_response()
+        if not response or response['error']:
+            print(f'Error: Could not download the file {remote_file}.')
+            return False
+        return True
+
+    async def upload_file(self, local_file: str, remote_file: str) -> bool:
+        """
+        Uploads a local file to the server.
+
+        :param local_file: Path to the local file.
+        :param remote_file: Path to the remote file.
+
+        :return: True if the file was uploaded successfully, False otherwise
+        """
+        if not os.path.isfile(local_file):
+            print(f'Error: {local_file} does not exist.')
+            return False
+        with open(local_file, 'rb') as file:
+            stream = await self._open_transfer('STOR ' + remote_file)
+            if stream is None:
+                print(f'Error: Could not upload the file {local_file}.')
+                return False
+            _, writer = stream
+            loop = asyncio.get_running_loop()
+            try:
+                while True:
+                    chunk = await loop.run_in_executor(None, file.read, self.block_size)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    await asyncio.wait_for(writer.drain(), self.connection.timeout)
+                writer.close()
+                await writer.wait_closed()
+            except (OSError, asyncio.TimeoutError):
+                writer.close()
+                await self.connection.get_response()
+                print(f'Error: Could not upload the file {local_file}.')
+                return False
+        response = await self.connection.get_response()
+        if not response or response['error']:
+            print(f'Error: Could not upload the file {local_file}.')
+            return False
+        return True
+
+    async def make_directory(self, directory: str) -> None:
+        """
+        Creates a directory on the server, an existing directory is not an error.
+
+        :param directory: Path to the directory to create.
+        """
+        await self.connection.send_request('MKD ' + directory)
+        await self.connection.get_response()
+
+    async def download_directory(self, remote_dir: str, local_dir: str,
+                                 workers: int = 4) -> bool:
+        """
+        Downloads a whole directory recursively, transferring up to `workers` files at once
+        on as many additional sessions, all on the running event loop.
+
+        :param remote_dir: directory to download from the server
+        :param local_dir: directory to save files on the local machine
+        :param workers: number of files to download concurrently
+        :return: True if every file was downloaded, False otherwise
+        """
+        files = []
+        pending = [(remote_dir, local_dir)]
+        while pending:
+            remote_path, local_path = pending.pop()
+            os.makedirs(local_path, exist_ok=True)
+            for entry in await self.entries(remote_path):
+                remote_child = remote_path.rstrip('/') + '/' + entry.name
+                local_child = os.path.join(local_path, entry.name)
+                if entry.is_dir:
+                    pending.append((remote_child, local_child))
+                elif entry.type == 'file':
+                    files.append((remote_child, local_child))
+        failed = await self._run_sessions(
+            files, workers, lambda session, item: session.download_file(*item))
+        if failed:
+            print(f'Error: Could not download {len(failed)} files from {remote_dir}.')
+        return not failed
+
+    async def upload_directory(self, local_dir: str, remote_dir: str,
+                               workers: int = 4) -> bool:
+        """
+        Uploads a whole directory recursively, transferring up to `workers` files at once
+        on as many additional sessions, all on the running event loop.
+
+        :param local_dir: local directory to upload
+        :param remote_dir: remote directory to upload to
+        :param workers: number of files to upload concurrently
+        :return: True if every file was uploaded, False otherwise
+        """
+        files = []
+        await self.make_directory(remote_dir)
+        for root, dir_names, file_names in os.walk(local_dir):
+            relative_root = os.path.relpath(root, local_dir).replace('\\', '/')
+            remote_root = remote_dir if relative_root == '.' else \
+                remote_dir.rstrip('/') + '/' + relative_root
+            for dir_name in sorted(dir_names):
+                await self.make_directory(remote_root + '/' + dir_name)
+            for file_name in sorted(file_names):
+                files.append((os.path.join(root, file_name), remote_root + '/' + file_name))
+        failed = await self._run_sessions(
+            files, workers, lambda session, item: session.upload_file(*item))
+        if failed:
+            print(f'Error: Could not upload {len(failed)} files to {remote_dir}.')
+        return not failed
+
+    async def _open_transfer(self, command: str, offset: int = 0):
+        """
+        Opens a data connection and starts a transfer command on it, after REST if an
+        offset is given. The offset the server accepted is kept in `_offset`.
+
+        :return: The (reader, writer) pair of the data connection, or None if it could not
+                 be opened or the server refused the command.
+        """
+        self._last_response = None
+        self._offset = 0
+        stream = await self.connection.open_data_stream()
+        if stream is None:
+            return None
+        if offset:
+            await self.connection.send_request(f'REST {offset}')
+            response = await self.connection.get_response()
+            if response and response['code'] == '350':
+                self._offset = offset
+        await self.connection.send_request(command)
+        response = await self.connection.get_response()
+        self._last_response = response
+        if not response or response['code'] not in ('125', '150'):
+            stream[1].close()
+            return None
+        return stream
+
+    async def _run_sessions(self, items: list, workers: int, action) -> list:
+        """
+        Runs an action for every item on `workers` new sessions logged in like this one.
+
+        :param items: the items to process
+        :param workers: number of sessions to open
+        :param action: coroutine function taking a session and an item, returning True on
+                       success
+        :return: the items whose action failed or that were not processed
+        """
+        if not items:
+            return []
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+        failed = []
+
+        async def work():
+            session = type(self)(self.block_size, self.connection.timeout)
+            if not await session.login(self.host, self.user, self._password, self._port):
+                return
+            try:
+                while not queue.empty():
+                    item = queue.get_nowait()
+                    if not await action(session, item):
+                        failed.append(item)
+                        if not session.connection.connected:
+                            return
+            finally:
+                await session.close()
+
+        await asyncio.gather(*(work() for _ in range(max(1, min(workers, len(items))))))
+        while not queue.empty():
+            failed.append(queue.get_nowait())
+        return failed
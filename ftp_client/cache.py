@@ -0,0 +1,112 @@
+"""
+FTP Cache module.
+
+This module provides the in-memory cache of remote directory listings.
+"""
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+
+
+class ListingCache:
+    """
+    Keeps the entries of recently listed remote directories for `ttl` seconds.
+
+    At most `max_size` directories are kept, the least recently used one is dropped first.
+    The cache is thread-safe, so sessions of one pool can share it.
+
+    :ivar ttl (float): The time in seconds a listing stays valid.
+    :ivar max_size (int): The maximum number of directories to keep.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_size: int = 1024):
+        """
+        Initializes an empty cache.
+
+        :param ttl: The time in seconds a listing stays valid, 0 disables the cache.
+        :param max_size: The maximum number of directories to keep.
+        """
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self._listings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._listings)
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        """
+        Normalizes a remote path, so that e.g. "dir", "dir/" and "./dir//" share one key.
+
+        :param path: The remote path.
+
+        :return: The normalized path.
+        """
+        path = path.replace('\\', '/')
+        if not path:
+            return '.'
+        normalized = posixpath.normpath(path)
+        if normalized.startswith('//'):
+            normalized = '/' + normalized.lstrip('/')
+        return normalized
+
+    def get(self, path: str):
+        """
+        Looks up the listing of a directory.
+
+        :param path: The remote path of the directory.
+
+        :return: A list of FtpEntry, or None if the directory is not cached or expired.
+        """
+        key = self.normalize(path)
+        with self._lock:
+            cached = self._listings.get(key)
+            if cached is None:
+                return None
+            stored, entries = cached
+            if time.monotonic() - stored >= self.ttl:
+                del self._listings[key]
+                return None
+            self._listings.move_to_end(key)
+            return list(entries)
+
+    def put(self, path: str, entries) -> None:
+        """
+        Stores the listing of a directory.
+
+        :param path: The remote path of the directory.
+        :param entries: The FtpEntry of the directory.
+        """
+        if self.ttl <= 0:
+            return
+        key = self.normalize(path)
+        with self._lock:
+            self._listings[key] = (time.monotonic(), tuple(entries))
+            self._listings.move_to_end(key)
+            while len(self._listings) > self.max_size:
+                self._listings.popitem(last=False)
+
+    def invalidate(self, path: str) -> None:
+        """
+        Drops the listings a change of `path` makes stale: the listing of its parent
+        directory and, for directories, its own listing and those below it.
+
+        :param path: The remote path of the file or directory that was changed.
+        """
+        key = self.normalize(path)
+        parent = posixpath.dirname(key) or '.'
+        prefix = key.rstrip('/') + '/'
+        with self._lock:
+            self._listings.pop(parent, None)
+            for cached in [cached for cached in self._listings
+                           if cached == key or cached.startswith(prefix)]:
+                del self._listings[cached]
+
+    def clear(self) -> None:
+        """
+        Drops all listings.
+        """
+        with self._lock:
+            self._listings.clear()
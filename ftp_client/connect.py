@@ -4,7 +4,142 @@ FTP Connection module.
 This module provides a Connection class for FTP client.
 """
 
+import queue
 import socket
+import threading
+import time
+
+DNS_TTL = 300
+CONNECT_DELAY = 0.25
+
+_dns_cache = {}
+_dns_lock = threading.Lock()
+
+
+def resolve(host: str, port: int) -> list:
+    """
+    Resolves a host to all of its IPv6 and IPv4 addresses, cached for DNS_TTL seconds, so
+    the many sessions of a pool cost one lookup.
+
+    The families are interleaved, starting with the one the resolver prefers, so that a
+    connection attempt to the other family follows right after the first (RFC 8305).
+
+    :param host: The hostname or IP address.
+    :param port: The port to connect to.
+
+    :return: A list of (family, sockaddr) tuples.
+    :raises socket.gaierror: If the host cannot be resolved.
+    """
+    key = (host, port)
+    with _dns_lock:
+        cached = _dns_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < DNS_TTL:
+            return cached[1]
+    by_family = {}
+    for family, _, _, _, sockaddr in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+        if (family, sockaddr) not in by_family.setdefault(family, []):
+            by_family[family].append((family, sockaddr))
+    groups = list(by_family.values())
+    addresses = []
+    for index in range(max((len(group) for group in groups), default=0)):
+        addresses.extend(group[index] for group in groups if index < len(group))
+    with _dns_lock:
+        _dns_cache[key] = (time.monotonic(), addresses)
+    return addresses
+
+
+def connect_fastest(addresses: list, timeout: float, delay: float = CONNECT_DELAY):
+    """
+    Connects to whichever of several addresses answers first, "happy eyeballs" style: the
+    attempts start `delay` seconds apart, or at once after a failure, and run in parallel.
+
+    :param addresses: (family, sockaddr) tuples as returned by `resolve`.
+    :param timeout: The timeout of every single attempt, in seconds.
+    :param delay: The head start of every attempt over the next one, in seconds.
+
+    :return: The connected socket.
+    :raises OSError: The error of the last attempt if none succeeded.
+    """
+    results = queue.Queue()
+    lock = threading.Lock()
+    done = []
+
+    def attempt(family, sockaddr):
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(sockaddr)
+        except OSError as error:
+            sock.close()
+            results.put((None, error))
+            return
+        with lock:
+            if done:
+                sock.close()
+                return
+            results.put((sock, None))
+
+    winner, error, pending = None, OSError('No address to connect to.'), 0
+    for index, (family, sockaddr) in enumerate(addresses):
+        threading.Thread(target=attempt, args=(family, sockaddr), daemon=True).start()
+        pending += 1
+        last = index == len(addresses) - 1
+        while pending:
+            try:
+                sock, error_or_none = results.get(timeout=None if last else delay)
+            except queue.Empty:
+                break
+            pending -= 1
+            if sock is not None:
+                winner = sock
+                break
+            error = error_or_none
+            if not last:
+                break
+        if winner is not None:
+            break
+    with lock:
+        done.append(True)
+    while not results.empty():
+        sock, _ = results.get()
+        if sock is not None and sock is not winner:
+            sock.close()
+    if winner is None:
+        raise error
+    return winner
+
+
+class ReplyFramer:
+    """
+    Collects the lines of a single reply (RFC 959 section 4.2), following "123-"
+    continuation lines up to the closing "123 " line. The blocking and the asyncio control
+    connections feed it the lines they read.
+
+    :ivar lines (list): The lines of the reply kept so far.
+    """
+
+    def __init__(self, max_lines=None):
+        """
+        :arg: max_lines: The number of inner lines to keep, see `Connection.get_response`.
+        """
+        self.lines = []
+        self.max_lines = max_lines
+
+    def add(self, line: str) -> bool:
+        """
+        Adds the next line of the reply.
+
+        :returns: True once the reply is complete.
+        """
+        if not self.lines:
+            self.lines.append(line)
+            return line[3:4] != '-'
+        if line[:3] == self.lines[0][:3] and line[3:4] in (' ', ''):
+            self.lines.append(line)
+            return True
+        if self.max_lines is None or len(self.lines) <= self.max_lines + 1:
+            self.lines.append(line)
+        return False
 
 
 class Connection:
@@ -13,6 +148,8 @@ class Connection:
     """
 
     PORT = 21
+    RECV_SIZE = 4096
+    PIPELINE_DEPTH = 64
 
     def __init__(self):
         """
@@ -21,24 +158,31 @@ class Connection:
         self.host = None
         self.server = None
         self.connected = False
+        self.use_epsv = False
+        self._buffer = bytearray()
 
     def connect(self, host):
         """
-        Connects to the FTP server.
+        Connects to the FTP server, over IPv6 or IPv4, at whichever of its addresses answers
+        first, see `connect_fastest`.
 
         :arg: host: The hostname or IP address of the FTP server.
 
         :returns: The response code if successful, or False if the connection fails.
         """
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._buffer = bytearray()
         try:
-            self.host = socket.gethostbyname(host)
+            addresses = resolve(host, self.PORT)
         except socket.gaierror:
             return False
         try:
-            self.server.connect((self.host, self.PORT))
-        except socket.error:
+            self.server = connect_fastest(addresses, 20)
+        except OSError:
             return False
+        self.host = self.server.getpeername()[0]
+        # PASV only works with IPv4 (RFC 2428).
+        if self.server.family == socket.AF_INET6:
+            self.use_epsv = True
         self.server.settimeout(20)
         response = self.get_response()
         if not response:
@@ -50,8 +194,10 @@ class Connection:
         """
         Closes connection to server
         """
-        self.server.close()
+        if self.server is not None:
+            self.server.close()
         self.connected = False
+        self._buffer = bytearray()
 
     def send_request(self, request):
         """
@@ -60,48 +206,171 @@ class Connection:
         request = request.strip()
         self.server.sendall(f'{request}\r\n'.encode())
 
-    def get_response(self, print_response=False):
+    def is_alive(self, timeout=5):
         """
-        Receives response from server, prints and returns the parsed result
+        Checks that the server still answers on this connection by sending NOOP.
+
+        Unlike `get_response`, a timeout here only marks the connection as dead.
+
+        :arg: timeout: How long to wait for the reply, in seconds.
+
+        :returns: True if the server replied with a positive completion code.
+        """
+        if not self.connected:
+            return False
+        previous_timeout = self.server.gettimeout()
+        try:
+            self.server.settimeout(timeout)
+            self.send_request('NOOP')
+            lines = self._read_reply()
+        except OSError:
+            return False
+        finally:
+            self.server.settimeout(previous_timeout)
+        return lines is not None and lines[-1][:1] == '2'
+
+    def send_pipelined(self, requests):
+        """
+        Sends several requests back to back and matches their replies in order.
+
+        Requests are written in windows of PIPELINE_DEPTH, so neither side can stall on a
+        full socket buffer while the other one is still writing.
+
+        :arg: requests: The requests to send.
+
+        :returns: A list with the parsed reply to each request, False for every request
+                  left unanswered because the server closed the connection.
+        """
+        requests = [request.strip() for request in requests]
+        responses = []
+        for start in range(0, len(requests), self.PIPELINE_DEPTH):
+            window = requests[start:start + self.PIPELINE_DEPTH]
+            self.server.sendall(''.join(f'{request}\r\n' for request in window).encode())
+            for _ in window:
+                response = self.get_response()
+                if not response:
+                    return responses + [False] * (len(requests) - len(responses))
+                responses.append(response)
+        return responses
+
+    def get_response(self, print_response=False, exit_on_timeout=True, max_lines=None):
+        """
+        Receives one complete reply from server, prints and returns the parsed result.
+
+        Replies are framed line by line from a persistent buffer, so multi-line replies,
+        replies split across several segments and replies that arrive together are all
+        returned exactly one at a time.
+
+        :arg: exit_on_timeout: Whether a reply timeout exits, rather than only closing the
+              connection and returning False.
+        :arg: max_lines: For replies that may be very long, such as STAT listings, the number
+              of inner lines to keep. One more is kept to show that there were more; the
+              rest of the reply is read and dropped.
+
+        :returns: The parsed reply, or False if the server closed the connection.
         """
         try:
-            response = self.server.recv(1024).decode()
-            if print_response:
-                print(response)
-            return self._parse_response(response)
+            lines = self._read_reply(max_lines)
         except socket.timeout:
             print("Timeout error, connection closed")
             self.close()
+            if not exit_on_timeout:
+                return False
             exit()
+        if lines is None:
+            self.close()
+            return False
+        response = '\r\n'.join(lines)
+        if print_response:
+            print(response)
+        return self._parse_response(response)
+
+    def _read_line(self):
+        """
+        Returns the next line from the control channel without its line terminator,
+        or None if the server closed the connection.
+        """
+        while True:
+            end = self._buffer.find(b'\n')
+            if end != -1:
+                line = bytes(self._buffer[:end + 1])
+                del self._buffer[:end + 1]
+                return line.rstrip(b'\r\n').decode('utf-8', errors='replace')
+            chunk = self.server.recv(self.RECV_SIZE)
+            if not chunk:
+                return None
+            self._buffer += chunk
+
+    def _read_reply(self, max_lines=None):
+        """
+        Reads a single reply, see `ReplyFramer`.
+
+        :arg: max_lines: The number of inner lines to keep, see `get_response`.
+
+        :returns: The list of reply lines, or None if the server closed the connection.
+        """
+        framer = ReplyFramer(max_lines)
+        while True:
+            line = self._read_line()
+            if line is None:
+                return None
+            if framer.add(line):
+                return framer.lines
 
     @staticmethod
     def _parse_response(response):
         """
-        Returns a dictionary with the 3 digit response code and message
+        Returns a dictionary with the 3 digit response code, the message of the last
+        line and all lines of the reply
         """
-        response = response.strip().split('\r\n')[-1]
-        code = response[:3]
-        message = response[4:].strip()
+        lines = response.strip().split('\r\n')
+        last_line = lines[-1]
+        code = last_line[:3]
+        message = last_line[4:].strip()
         error = False
-        if code[0] == '4' or code[0] == '5':
+        if code[:1] == '4' or code[:1] == '5':
             error = True
         return {
             'code': code,
             'message': message,
-            'error': error
+            'error': error,
+            'lines': lines
         }
 
     def create_pasv_con(self):
         """
         Given a response from an issued PASV command, creates a connection
         to the specified host and port.
+
+        With `use_epsv` set, EPSV (RFC 2428) is tried first. Its reply carries only the
+        port, so there is no address to parse or to get wrong behind NAT. A refused EPSV
+        switches the connection back to PASV for good. PASV can only describe IPv4 addresses,
+        so on an IPv6 control connection a refused EPSV means no data connection.
         """
+        if self.use_epsv:
+            self.send_request('EPSV')
+            response = self.get_response()
+            if response and response['code'] == '229':
+                params = response['message'].partition('(')[2].partition(')')[0]
+                fields = params.split(params[:1]) if params else []
+                if len(fields) != 5 or not fields[3].isdigit():
+                    return False
+                file_port = int(fields[3])
+                file_con = socket.socket(self.server.family, socket.SOCK_STREAM)
+                file_con.connect((self.host, file_port))
+                return file_con
+            if not response:
+                return False
+            self.use_epsv = False
+        if self.server.family == socket.AF_INET6:
+            print('Error: The server refused EPSV, which is required over IPv6.')
+            return False
         self.send_request('PASV')
         response = self.get_response()
         if not response:
             return False
         params = response['message'].split('(')[1].split(')')[0].split(',')
         file_port = (int(params[4]) * 256) + int(params[5])
-        file_con = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        file_con = socket.socket(self.server.family, socket.SOCK_STREAM)
         file_con.connect((self.host, file_port))
         return file_con
@@ -5,8 +5,15 @@ This module provides a client for interacting with an FTP server.
 """
 import os
 import asyncio
+import queue
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
+from ftp_client.cache import ListingCache
 from ftp_client.connect import Connection
+from ftp_client.listing import parse_list_line, parse_mlsx_line, parse_time_val
+from ftp_client.transfer import DEFAULT_BLOCK_SIZE, DeflateConnection, preallocate, \
+    receive_file, send_file
 
 
 class FtpClient:
@@ -17,8 +24,26 @@ class FtpClient:
     :ivar current_dir (str): The current working directory on the server.
     :ivar transfer_type (tuple): A tuple containing the current transfer mode and description.
     :ivar logged_in (bool): Whether the client is logged in to the server.
+    :ivar host (str): The server the client logged in to.
+    :ivar user (str): The username the client logged in with.
+    :ivar block_size (int): The buffer size used for data transfers.
+    :ivar listing_cache (ListingCache): The cache of the directories listed by `entries`.
+    :ivar compression_level (int): The zlib level of MODE Z transfers, None for uncompressed
+                                   transfers.
+    :ivar features (dict): The extensions the server advertised with FEAT, mapped to their
+                           parameters, None before the login.
+    :ivar listing_mode (str): How `entries` lists directories: 'stat' on the control
+                              connection, 'data' on a data connection, or 'auto' for STAT
+                              for small directories whenever the server lacks MLSD.
     """
 
+    MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+    SYNC_TOLERANCE = 2.0
+    FXP_TIMEOUT = 3600
+    STAT_MAX_LINES = 1000
+    # FEAT replies by host, shared by all clients of the process.
+    _host_features = {}
+
     def __init__(self):
         """
         Initializes a new FtpClient object with default modes.
@@ -26,6 +51,18 @@ class FtpClient:
         self.connection = Connection()
         self.transfer_type = ('I', 'binary')
         self.logged_in = False
+        self.host = None
+        self.user = None
+        self._password = None
+        self._pool = None
+        self._mlsd_supported = None
+        self.block_size = DEFAULT_BLOCK_SIZE
+        self.listing_cache = ListingCache()
+        self.compression_level = None
+        self.features = None
+        self.listing_mode = 'auto'
+        self._stat_supported = None
+        self._large_directories = set()
 
     def connect(self, host: str, user: str, password: str):
         """
@@ -36,39 +73,161 @@ class FtpClient:
         :param password: The password to authenticate with.
         """
         if not self.connection.connected:
-            connect_code = self.connection.connect(host)
-            if connect_code == '220':
-                self.connection.send_request('USER ' + user)
-                response = self.connection.get_response()
-                if response and response['code'] == '331':
-                    self.connection.send_request('PASS ' + password)
-                    response = self.connection.get_response()
-                    if response and response['code'] == '230':
-                        self.logged_in = True
-                    else:
-                        print("Error: Invalid password.")
-                        exit()
-                    if self.logged_in:
-                        self.connection.send_request('TYPE I')
-                        self.connection.get_response()
-                else:
-                    print("Error: Invalid username.")
-                    exit()
-            else:
-                print(f"Error: Invalid hostname or IP address ({host}).")
+            if not self.login(host, user, password):
                 exit()
 
+    def login(self, host: str, user: str, password: str) -> bool:
+        """
+        Connects to the specified FTP server and authenticates, without exiting on failure.
+
+        :param host: The hostname or IP address of the FTP server.
+        :param user: The username to authenticate with.
+        :param password: The password to authenticate with.
+
+        :return: True if the client is logged in, False otherwise
+        """
+        connect_code = self.connection.connect(host)
+        if connect_code != '220':
+            print(f"Error: Invalid hostname or IP address ({host}).")
+            self.connection.close()
+            return False
+        self.connection.send_request('USER ' + user)
+        response = self.connection.get_response()
+        if not response or response['code'] != '331':
+            print("Error: Invalid username.")
+            self.connection.close()
+            return False
+        if not self._send_pass(password):
+            print("Error: Invalid password.")
+            self.connection.close()
+            return False
+        self.connection.send_request('TYPE I')
+        self.connection.get_response()
+        self.host = host
+        self.user = user
+        self._password = password
+        self.negotiate_features()
+        if self.compression_level is not None:
+            self.enable_compression(self.compression_level)
+        return True
+
+    def negotiate_features(self) -> dict:
+        """
+        Learns the extensions the server supports with FEAT (RFC 2389), once per host, and
+        switches the client to the fastest mechanisms available: MLSD listings and EPSV data
+        connections where advertised, and no commands the server is known to lack.
+
+        Servers that do not answer FEAT are treated as supporting everything, so every
+        extension is tried and dropped on the first refusal, as before.
+
+        :return: A dictionary mapping every advertised feature, upper case, to its
+                 parameters, e.g. {'MLST': 'type*;size*;modify*;', 'MODE Z': '', ...}.
+        """
+        features = self._host_features.get(self.host)
+        if features is None:
+            self.connection.send_request('FEAT')
+            response = self.connection.get_response()
+            if not response:
+                return {}
+            features = {}
+            if response['code'] == '211':
+                for line in response['lines'][1:-1]:
+                    name, _, params = line.strip().partition(' ')
+                    name = name.upper()
+                    if name == 'MODE':
+                        name, params = f'MODE {params.strip().upper()}', ''
+                    if name:
+                        features[name] = params.strip()
+            self._host_features[self.host] = features
+        self.features = features
+        if features:
+            self._mlsd_supported = 'MLST' in features
+            if 'EPSV' in features:
+                self.connection.use_epsv = True
+        return features
+
+    def _supports(self, feature: str) -> bool:
+        """
+        Whether a command may be worth sending: the server advertised it, or it did not
+        report its features at all.
+        """
+        return not self.features or feature in self.features
+
+    def enable_compression(self, level: int = 6) -> bool:
+        """
+        Switches data transfers, including listings, to MODE Z, which deflates the data
+        connection. Worth it for compressible data such as logs and SQL dumps on slow links.
+
+        :param level: The zlib compression level of uploaded data, from 1 to 9.
+
+        :return: True if the server accepted MODE Z, False if transfers stay uncompressed.
+        """
+        if self._check_connection() and self._check_logged_in():
+            responses = [False]
+            if self._supports('MODE Z'):
+                responses = self.connection.send_pipelined(
+                    ['MODE Z', f'OPTS MODE Z LEVEL {level}'])
+            if responses[0] and responses[0]['code'] == '200':
+                self.compression_level = level
+                return True
+            print('Error: The server does not support compressed transfers (MODE Z).')
+            self.compression_level = None
+        return False
+
+    def disable_compression(self) -> None:
+        """
+        Switches data transfers back to the uncompressed stream mode.
+        """
+        if self._check_connection() and self._check_logged_in():
+            self.connection.send_request('MODE S')
+            self.connection.get_response()
+            self.compression_level = None
+
     def close(self) -> None:
         """
         Closes the connection to the FTP server.
 
         """
         if self._check_connection():
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
             self.connection.send_request('QUIT')
             self.connection.get_response()
             self.connection.close()
             self.logged_in = False
 
+    def session_pool(self, size: int):
+        """
+        Returns a pool of additional sessions logged in like this client.
+
+        The pool is kept until the client is closed, so consecutive parallel operations
+        reuse the same warm sessions instead of logging in again.
+
+        :param size: The minimum number of sessions the pool must be able to open.
+
+        :return: The FtpSessionPool.
+        """
+        # Imported here since the session pool module builds on this one.
+        from ftp_client.session_pool import FtpSessionPool
+        if self._pool is None or self._pool.size < size:
+            if self._pool is not None:
+                self._pool.close()
+            self._pool = FtpSessionPool(self.host, self.user, self._password, size,
+                                        session_factory=self._new_session)
+        return self._pool
+
+    def _new_session(self):
+        """
+        Creates a new, not yet connected session of the pool, which shares the listing
+        cache of this client, so changes made by either invalidate the listings of both,
+        and uses the same transfer mode.
+        """
+        session = type(self)()
+        session.listing_cache = self.listing_cache
+        session.compression_level = self.compression_level
+        return session
+
     def _send_pass(self, password):
         """
         Sends a password to the server for authentication.
@@ -94,18 +253,19 @@ class FtpClient:
         """
         result = []
         if self._check_connection() and self._check_logged_in():
-            pasv_con = self.connection.create_pasv_con()
-            if not pasv_con:
-                return False
-            self.connection.send_request('NLST ' + directory)
-            self.connection.get_response()
-            from_server = pasv_con.recv(4096).decode('utf-8')
-            print(from_server)
-            result = from_server.strip('\r\n').split('\r\n')
-            self.connection.get_response()
-            pasv_con.close()
+            for name in self.iter_nlist(directory):
+                print(name)
+                result.append(name)
         return result
 
+    def iter_nlist(self, directory=''):
+        """
+        Yields the names in a directory as they arrive from the server, see `_iter_listing`.
+
+        :param directory: The name of the directory to list (default is the current directory).
+        """
+        yield from self._iter_listing('NLST ' + directory)
+
     def list(self, directory='', list_all=False, print_result=False):
         """
         Sends a request to receive the contents of a directory on the server.
@@ -119,25 +279,261 @@ class FtpClient:
         """
         result = []
         if self._check_connection() and self._check_logged_in():
-            pasv_con = self.connection.create_pasv_con()
-            if not pasv_con:
-                print("Error: Could not establish a connection to the server.")
-            if list_all:
-                self.connection.send_request('LIST -R ' + directory)
+            for line in self.iter_list(directory, list_all):
+                if print_result:
+                    print(line)
+                result.append(line)
+            if print_result and not result:
+                print(f'Directory {directory} not found.')
+        return result
+
+    def iter_list(self, directory='', list_all=False):
+        """
+        Yields the LIST lines of a directory as they arrive from the server, see
+        `_iter_listing`.
+
+        :param directory: The name of the directory to list (default is the current directory).
+        :param list_all: Whether to list directories recursively.
+        """
+        yield from self._iter_listing(('LIST -R ' if list_all else 'LIST ') + directory)
+
+    def mlsd(self, directory=''):
+        """
+        Requests a machine-readable listing of a directory with MLSD (RFC 3659).
+
+        :param directory: The name of the directory to list (default is the current directory).
+
+        :return: A list of FtpEntry without the "cdir"/"pdir" entries, or None if the server
+                 refused the listing, e.g. because it does not support MLSD or the path is
+                 not a directory.
+        """
+        if self._check_connection() and self._check_logged_in():
+            pasv_con = self._open_mlsd(directory)
+            if pasv_con:
+                return list(self._iter_mlsd_entries(pasv_con))
+        return None
+
+    def stat_list(self, directory='', max_lines=None):
+        """
+        Lists a directory with STAT, whose reply carries the LIST lines on the control
+        connection. This saves the data connection and its TCP handshake, which dominates
+        the listing of deep trees of small directories.
+
+        :param directory: The name of the directory to list (default is the current directory).
+        :param max_lines: The largest listing to accept. Longer replies are read and dropped
+                          line by line instead of being kept in memory.
+
+        :return: A list of LIST lines, or None if the server cannot list with STAT or the
+                 listing is longer than `max_lines`.
+        """
+        if self._stat_supported is False or \
+                not (self._check_connection() and self._check_logged_in()):
+            return None
+        # A bare STAT reports the server status, so the current directory is named.
+        self.connection.send_request('STAT ' + (directory or '.'))
+        response = self.connection.get_response(max_lines=max_lines)
+        if not response:
+            return None
+        if response['code'] in ('211', '212', '213'):
+            self._stat_supported = True
+            if max_lines is not None and len(response['lines']) - 2 > max_lines:
+                return None
+            return [line[1:] if line.startswith(' ') else line
+                    for line in response['lines'][1:-1] if line.strip()]
+        if response['code'] in ('500', '501', '502', '504'):
+            self._stat_supported = False
+        return None
+
+    def _use_stat_listing(self) -> bool:
+        """
+        Whether `entries` lists with STAT, see `listing_mode`. In 'auto' mode MLSD is
+        preferred where available, since its facts are exact where LIST times are not.
+        """
+        return self.listing_mode == 'stat' or \
+            (self.listing_mode == 'auto' and self._mlsd_supported is False)
+
+    def _stat_list_lines(self, directory: str):
+        """
+        Lists a directory with STAT if `listing_mode` allows it, or returns None for a
+        listing on a data connection.
+
+        In 'auto' mode only directories of at most `STAT_MAX_LINES` entries are listed
+        over the control connection. Whether a directory is small is not known before it
+        is listed, so a longer STAT reply is dropped as it arrives, the directory is listed
+        with LIST instead and is remembered to go straight to LIST next time.
+        """
+        if not self._use_stat_listing():
+            return None
+        if self.listing_mode == 'stat':
+            return self.stat_list(directory)
+        key = ListingCache.normalize(directory)
+        if key in self._large_directories:
+            return None
+        lines = self.stat_list(directory, self.STAT_MAX_LINES)
+        if lines is None and self._stat_supported:
+            self._large_directories.add(key)
+        return lines
+
+    def mlst(self, path: str):
+        """
+        Requests the facts of a single file or directory with MLST, on the control connection.
+
+        :param path: The path to the entry.
+
+        :return: An FtpEntry whose name is the full path, or None if the server does not
+                 support MLST or the entry does not exist.
+        """
+        if self._check_connection() and self._check_logged_in():
+            self.connection.send_request('MLST ' + path)
+            response = self.connection.get_response()
+            if response and response['code'] == '250':
+                for line in response['lines'][1:-1]:
+                    entry = parse_mlsx_line(line)
+                    if entry:
+                        return entry
+        return None
+
+    def entries(self, directory=''):
+        """
+        Lists a directory as typed entries, with MLSD where the server supports it and by
+        parsing LIST otherwise.
+
+        Listings are kept in `listing_cache`, so listing the same directory again within its
+        time to live does not cost another data connection. Depending on `listing_mode`,
+        directories are listed with STAT on the control connection, see `stat_list`; very
+        large directories are better streamed with `iter_entries`.
+
+        :param directory: The name of the directory to list (default is the current directory).
+
+        :return: A list of FtpEntry.
+        """
+        result = self.listing_cache.get(directory)
+        if result is None:
+            lines = self._stat_list_lines(directory)
+            if lines is None:
+                result = list(self.iter_entries(directory))
             else:
-                self.connection.send_request('LIST ' + directory)
-            self.connection.get_response()
-            from_server = pasv_con.recv(4096).decode('utf-8')
-            if print_result:
-                if from_server:
-                    print(from_server)
-                else:
-                    print(f'Directory {directory} not found.')
-            result = list(filter(None, from_server.strip('\r\n').split('\r\n')))
-            self.connection.get_response()
-            pasv_con.close()
+                result = [entry for entry in map(parse_list_line, lines)
+                          if entry and entry.name not in ('.', '..')]
+            self.listing_cache.put(directory, result)
         return result
 
+    def iter_entries(self, directory=''):
+        """
+        Yields the entries of a directory as they arrive from the server, like `entries`.
+
+        Entries of a listing in `listing_cache` are yielded from there, otherwise the
+        control connection is busy until the iterator is exhausted or closed.
+
+        :param directory: The name of the directory to list (default is the current directory).
+        """
+        cached = self.listing_cache.get(directory)
+        if cached is not None:
+            yield from cached
+            return
+        if self._check_connection() and self._check_logged_in():
+            if self._mlsd_supported is not False:
+                pasv_con = self._open_mlsd(directory)
+                if pasv_con:
+                    yield from self._iter_mlsd_entries(pasv_con)
+                    return
+            for line in self.iter_list(directory):
+                entry = parse_list_line(line)
+                if entry and entry.name not in ('.', '..'):
+                    yield entry
+
+    def _open_mlsd(self, directory):
+        """
+        Starts an MLSD listing and remembers whether the server supports the command.
+
+        :return: The data connection, or None if the server refused the listing.
+        """
+        pasv_con, response = self._open_listing('MLSD ' + directory)
+        if pasv_con:
+            self._mlsd_supported = True
+        elif response and response['code'] in ('500', '502'):
+            self._mlsd_supported = False
+        return pasv_con
+
+    def _iter_mlsd_entries(self, pasv_con):
+        """
+        Yields the entries of an MLSD listing without the "cdir"/"pdir" entries.
+        """
+        for line in self._iter_data_lines(pasv_con):
+            entry = parse_mlsx_line(line)
+            if entry and entry.type not in ('cdir', 'pdir'):
+                yield entry
+
+    def _iter_listing(self, command):
+        """
+        Sends a listing command and yields the lines of its data connection as they arrive,
+        so listings of any size are read with constant memory.
+
+        The control connection is busy until the iterator is exhausted or closed.
+
+        :param command: The listing command with its argument.
+        """
+        if self._check_connection() and self._check_logged_in():
+            pasv_con, _ = self._open_listing(command)
+            if pasv_con:
+                yield from self._iter_data_lines(pasv_con)
+
+    def _create_data_con(self):
+        """
+        Opens a passive data connection, wrapped for MODE Z if compression is enabled.
+
+        :return: The data connection, or False if it could not be opened.
+        """
+        pasv_con = self.connection.create_pasv_con()
+        if pasv_con and self.compression_level is not None:
+            return DeflateConnection(pasv_con, self.compression_level)
+        return pasv_con
+
+    def _open_listing(self, command):
+        """
+        Opens a data connection and sends a listing command.
+
+        :param command: The listing command with its argument.
+
+        :return: A tuple of the data connection, or None if it could not be opened or the
+                 server refused the command, and the reply of the server.
+        """
+        pasv_con = self._create_data_con()
+        if not pasv_con:
+            print("Error: Could not establish a connection to the server.")
+            return None, None
+        self.connection.send_request(command.strip())
+        response = self.connection.get_response()
+        if not response or response['code'] not in ('125', '150'):
+            pasv_con.close()
+            return None, response
+        return pasv_con, response
+
+    def _iter_data_lines(self, data_con):
+        """
+        Yields the non-empty lines of a listing as they arrive on a data connection, then
+        closes it and reads the final reply. Only one block and the current partial line
+        are held in memory.
+        """
+        pending = b''
+        try:
+            while True:
+                chunk = data_con.recv(self.block_size)
+                if not chunk:
+                    break
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                for line in lines:
+                    line = line.rstrip(b'\r')
+                    if line:
+                        yield line.decode('utf-8', errors='replace')
+            pending = pending.rstrip(b'\r')
+            if pending:
+                yield pending.decode('utf-8', errors='replace')
+        finally:
+            data_con.close()
+            self.connection.get_response()
+
     def make_directory(self, directory: str) -> None:
         """
         Sends a request to create a directory on the server.
@@ -149,68 +545,296 @@ class FtpClient:
         if self._check_connection() and self._check_logged_in():
             self.connection.send_request('MKD ' + directory)
             self.connection.get_response()
+            self.listing_cache.invalidate(directory)
+
+    def make_directories(self, directories: list) -> None:
+        """
+        Creates several directories on the server, pipelining the MKD commands.
+
+        Parents must come before their children. Directories that already exist are
+        reported by the server as errors and ignored, like in `make_directory`.
+
+        :param directories: Paths to the directories to create.
+
+        :return: None
+        """
+        if directories and self._check_connection() and self._check_logged_in():
+            self.connection.send_pipelined(['MKD ' + directory for directory in directories])
+            for directory in directories:
+                self.listing_cache.invalidate(directory)
+
+    def delete_file(self, remote_file: str) -> bool:
+        """
+        Deletes a file on the server.
+
+        :param remote_file: Path to the remote file.
+
+        :return: True if the file was deleted, False otherwise
+        """
+        if self._check_connection() and self._check_logged_in():
+            self.connection.send_request('DELE ' + remote_file)
+            response = self.connection.get_response()
+            self.listing_cache.invalidate(remote_file)
+            if response and not response['error']:
+                return True
+            print(f'Error: Could not delete the file {remote_file}.')
+        return False
 
-    def upload_file(self, local_file: str, remote_file: str) -> bool:
+    def remove_directory(self, directory: str) -> bool:
+        """
+        Removes an empty directory on the server.
+
+        :param directory: Path to the remote directory.
+
+        :return: True if the directory was removed, False otherwise
+        """
+        if self._check_connection() and self._check_logged_in():
+            self.connection.send_request('RMD ' + directory)
+            response = self.connection.get_response()
+            self.listing_cache.invalidate(directory)
+            if response and not response['error']:
+                return True
+            print(f'Error: Could not remove the directory {directory}.')
+        return False
+
+    def size(self, remote_file: str):
+        """
+        Requests the size of a remote file.
+
+        :param remote_file: Path to the remote file.
+
+        :return: The size in bytes, or None if the server could not report it.
+        """
+        return self.stat_files([remote_file])[remote_file]['size']
+
+    def stat_files(self, remote_files: list) -> dict:
+        """
+        Requests the size and modification time of several remote files, pipelining
+        one SIZE and one MDTM command per file, or only those the server supports.
+
+        :param remote_files: Paths to the remote files.
+
+        :return: A dictionary mapping every path to a dictionary with its 'size' in bytes
+                 and 'modify' time as a UTC timestamp, either of which is None if the
+                 server could not report it.
+        """
+        result = {}
+        if self._check_connection() and self._check_logged_in():
+            commands = [command for command in ('SIZE', 'MDTM') if self._supports(command)]
+            responses = iter(self.connection.send_pipelined(
+                [f'{command} {remote_file}' for remote_file in remote_files
+                 for command in commands]))
+            for remote_file in remote_files:
+                result[remote_file] = {'size': None, 'modify': None}
+                for command in commands:
+                    response = next(responses)
+                    if not response or response['code'] != '213':
+                        continue
+                    if command == 'SIZE' and response['message'].isdigit():
+                        result[remote_file]['size'] = int(response['message'])
+                    elif command == 'MDTM':
+                        result[remote_file]['modify'] = parse_time_val(response['message'])
+        return result
+
+    def upload_file(self, local_file: str, remote_file: str, make_dirs: bool = True,
+                    resume: bool = False) -> bool:
         """
         Uploads a local file to the server.
 
+        In resume mode only the part of the local file beyond the size of the remote file is
+        sent, with REST and STOR or else APPE, provided the remote file is a prefix of the
+        local one. This continues interrupted uploads and sends just the new tail of
+        append-only files such as logs.
+
         :param local_file: Path to the local file.
         :param remote_file: Path to the remote file.
+        :param make_dirs: Whether to create the parent directory of the remote file first.
+        :param resume: Whether to continue from the data already on the server.
 
         :return: True if the file was uploaded successfully, False otherwise
         """
         if self._check_connection() and self._check_logged_in():
             if os.path.isfile(local_file):
                 self.connection.server.settimeout(20)
-                if os.path.dirname(remote_file) != '':
+                if make_dirs and os.path.dirname(remote_file) != '':
                     self.make_directory(os.path.dirname(remote_file).replace('\\', '/'))
+                offset = self._upload_offset(local_file, remote_file) if resume else 0
+                if offset == os.path.getsize(local_file) and offset:
+                    return True
                 with open(local_file, 'rb') as to_send:
-                    pasv_con = self.connection.create_pasv_con()
+                    pasv_con = self._create_data_con()
                     if not pasv_con:
                         print('Error: Could not establish a connection to the server to upload '
                               f'the file {local_file}.')
                         return False
-                    self.connection.send_request('STOR ' + remote_file)
+                    command = 'STOR '
+                    if offset:
+                        command = 'APPE '
+                        if self._supports('REST'):
+                            self.connection.send_request(f'REST {offset}')
+                            response = self.connection.get_response()
+                            if response and response['code'] == '350':
+                                command = 'STOR '
+                    self.connection.send_request(command + remote_file)
                     res = self.connection.get_response()
-                    if res['code'] != '150':
+                    self.listing_cache.invalidate(remote_file)
+                    if not res or res['code'] not in ('125', '150'):
+                        pasv_con.close()
                         print(f'Error: Could not upload the file {local_file}.')
                         return False
-                    response = pasv_con.send(to_send.read())
-                    if response == 0:
+                    try:
+                        send_file(pasv_con, to_send, offset)
+                    except OSError:
+                        pasv_con.close()
+                        self.connection.get_response()
                         print(f'Error: Could not upload the file {local_file}.')
                         return False
                 pasv_con.close()
-                self.connection.get_response()
+                response = self.connection.get_response()
                 self.connection.server.settimeout(20)
+                if not response or response['error']:
+                    print(f'Error: Could not upload the file {local_file}.')
+                    return False
                 return True
             print(f'Error: {local_file} does not exist.')
             return False
         return False
 
-    def upload_directory(self, local_dir: str, remote_dir: str) -> None:
+    def _upload_offset(self, local_file: str, remote_file: str) -> int:
+        """
+        Returns the offset a resumed upload can continue from: the size of the remote file
+        if it is a prefix of the local file, 0 otherwise.
+
+        The prefix is compared with the XCRC checksum where the server supports it, and is
+        otherwise assumed from the sizes alone.
+        """
+        remote_size = self.size(remote_file)
+        if not remote_size or remote_size > os.path.getsize(local_file):
+            return 0
+        if not self._supports('XCRC'):
+            return remote_size
+        self.connection.send_request(f'XCRC {remote_file} 0 {remote_size}')
+        response = self.connection.get_response()
+        if not response or response['code'][:1] != '2':
+            return remote_size
+        remote_crc = response['message'].split()[0] if response['message'] else ''
+        local_crc = 0
+        with open(local_file, 'rb') as file:
+            remaining = remote_size
+            while remaining:
+                chunk = file.read(min(self.block_size, remaining))
+                if not chunk:
+                    return 0
+                local_crc = zlib.crc32(chunk, local_crc)
+                remaining -= len(chunk)
+        try:
+            return remote_size if int(remote_crc, 16) == local_crc else 0
+        except ValueError:
+            return remote_size
+
+    def upload_directory(self, local_dir: str, remote_dir: str, workers: int = 1,
+                         resume: bool = False) -> bool:
         """
         Uploads a directory to the server
 
+        All remote directories are created first, then the files are uploaded one by one,
+        or spread over `workers` sessions from `session_pool`.
+
         :param local_dir: local directory to upload
         :param remote_dir: remote directory to upload to
+        :param workers: number of files to upload concurrently
+        :param resume: whether to continue from the data already on the server
+        :return: True if every file was uploaded, False otherwise
         """
         if self._check_connection() and self._check_logged_in():
-            self.make_directory(remote_dir)
-            for file_name in os.listdir(local_dir):
-                file_path = os.path.join(local_dir, file_name).replace('\\', '/')
-                if os.path.isdir(file_path):
-                    self.upload_directory(file_path, os.path.join(remote_dir, file_name)
-                                          .replace('\\', '/'))
-                else:
-                    self.upload_file(file_path, os.path.join(remote_dir, file_name)
-                                     .replace('\\', '/'))
+            directories = [remote_dir]
+            files = []
+            for root, dir_names, file_names in os.walk(local_dir):
+                relative_root = os.path.relpath(root, local_dir)
+                remote_root = remote_dir if relative_root == '.' else \
+                    os.path.join(remote_dir, relative_root).replace('\\', '/')
+                for dir_name in sorted(dir_names):
+                    directories.append(os.path.join(remote_root, dir_name).replace('\\', '/'))
+                for file_name in sorted(file_names):
+                    files.append((os.path.join(root, file_name).replace('\\', '/'),
+                                  os.path.join(remote_root, file_name).replace('\\', '/')))
+            self.make_directories(directories)
+            if workers > 1:
+                return self._upload_files_parallel(files, workers, resume)
+            uploaded = True
+            for local_file, remote_file in files:
+                uploaded = self.upload_file(local_file, remote_file, make_dirs=False,
+                                            resume=resume) and uploaded
+            return uploaded
+        return False
+
+    def _upload_files_parallel(self, files: list, workers: int, resume: bool = False) -> bool:
+        """
+        Uploads files into existing remote directories on several pooled sessions.
+
+        :param files: (local_file, remote_file) tuples to upload
+        :param workers: number of sessions to use
+        :param resume: whether to continue from the data already on the server
+        :return: True if every file was uploaded, False otherwise
+        """
+        failed = self._run_parallel(
+            files, workers, lambda session, item: session.upload_file(
+                item[0], item[1], make_dirs=False, resume=resume))
+        if failed:
+            print(f'Error: Could not upload {len(failed)} files.')
+        return not failed
+
+    def _run_parallel(self, items: list, workers: int, action) -> list:
+        """
+        Runs an action for every item on several pooled sessions.
+
+        :param items: the items to process
+        :param workers: number of sessions to use
+        :param action: callable taking a session and an item, returning True on success
+        :return: the items whose action failed or that were not processed
+        """
+        pool = self.session_pool(workers)
+        pending = queue.Queue()
+        for item in items:
+            pending.put(item)
+        failed = []
+
+        def work():
+            session = pool.acquire()
+            while session is not None:
+                try:
+                    item = pending.get_nowait()
+                except queue.Empty:
+                    pool.release(session)
+                    return
+                try:
+                    if not action(session, item):
+                        failed.append(item)
+                except (OSError, SystemExit):
+                    # A broken session, including a reply timeout that exits, only fails
+                    # this item. The session is replaced for the remaining items.
+                    failed.append(item)
+                    pool.release(session, discard=True)
+                    session = pool.acquire()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(work) for _ in range(workers)]
+        for future in futures:
+            future.result()
+        while not pending.empty():
+            failed.append(pending.get_nowait())
+        return failed
 
-    def upload(self, local_dir: str, remote_dir: str) -> None:
+    def upload(self, local_dir: str, remote_dir: str, workers: int = 1,
+               resume: bool = False) -> bool:
         """
         Uploads a file or directory to the server
 
         :param local_dir: local directory to upload
         :param remote_dir: remote directory to upload to
+        :param workers: number of files of a directory to upload concurrently
+        :param resume: whether to upload only what is missing on the server
+        :return: True if everything was uploaded, False otherwise
         """
         if self._check_connection() and self._check_logged_in():
             if not os.path.exists(local_dir):
@@ -222,30 +846,70 @@ class FtpClient:
                 remote_dir = os.path.join(remote_dir, os.path.basename(local_dir)) \
                     .replace('\\', '/')
                 path_to_create = ''
+                paths_to_create = []
                 for sub_dir in remote_dir.split('/'):
                     path_to_create = os.path.join(path_to_create, sub_dir).replace('\\', '/')
-                    self.make_directory(path_to_create)
-                self.upload_directory(local_dir, remote_dir)
+                    paths_to_create.append(path_to_create)
+                self.make_directories(paths_to_create)
+                uploaded = self.upload_directory(local_dir, remote_dir, workers, resume)
             else:
                 print(f'Uploading file {local_dir} to {remote_dir}')
-                self.upload_file(local_dir, remote_dir)
-            print('Upload complete.')
+                uploaded = self.upload_file(local_dir, remote_dir, resume=resume)
+            if uploaded:
+                print('Upload complete.')
+            else:
+                print('Upload finished with errors.')
+            return uploaded
+        return False
 
-    def download_file(self, remote_file, local_file):
+    def download_file(self, remote_file, local_file, size=None, resume=False, segments=1):
         """
         Downloads a single file from the remote server to the local machine.
 
+        In resume mode an existing partial local file is continued from its current length
+        with REST, and the final length is verified against the size of the remote file.
+        The local file is not preallocated and is cut back to the received data if the
+        transfer fails, so its length is always what a later resume can trust.
+        With several segments, a large file is split into byte ranges that are fetched in
+        parallel on sessions from `session_pool`, see `_download_segmented`.
+
         :param remote_file: file to download from the server
         :param local_file: file to save on the local machine
-        :return: None
+        :param size: size of the remote file if already known
+        :param resume: whether to continue an interrupted download of the file
+        :param segments: number of byte ranges to download concurrently
+        :return: True if the file was downloaded successfully, False otherwise
         """
         if self._check_connection() and self._check_logged_in():
+            partial = resume and os.path.isfile(local_file) and os.path.getsize(local_file) > 0
+            if segments > 1 and not partial and self._supports('REST'):
+                if size is None:
+                    size = self.size(remote_file)
+                if size is not None and size >= 2 * self.MIN_SEGMENT_SIZE:
+                    return self._download_segmented(remote_file, local_file, size, segments)
+            offset = 0
+            if resume:
+                if size is None:
+                    size = self.size(remote_file)
+                if os.path.isfile(local_file):
+                    offset = os.path.getsize(local_file)
+                if size is not None and offset == size:
+                    return True
+                if size is None or offset > size:
+                    offset = 0
             self.connection.server.settimeout(120)
-            pasv_con = self.connection.create_pasv_con()
+            pasv_con = self._create_data_con()
             if not pasv_con:
                 print('Error: Could not establish a connection to the server to download the file'
                       f' {remote_file}.')
                 return False
+            if offset and not self._supports('REST'):
+                offset = 0
+            if offset:
+                self.connection.send_request(f'REST {offset}')
+                response = self.connection.get_response()
+                if not response or response['code'] != '350':
+                    offset = 0
             self.connection.send_request('RETR ' + remote_file)
             response = self.connection.get_response()
             if response and response['code'] == '550':
@@ -253,73 +917,650 @@ class FtpClient:
                 print(f'Error: Could not download the file {remote_file}.'
                       ' File does not exist on the server.')
                 return False
-            with open(local_file, 'wb') as file:
-                while True:
-                    recv_data = pasv_con.recv(1024)
-                    if not recv_data:
-                        break
-                    file.write(recv_data)
+            with open(local_file, 'r+b' if offset else 'wb') as file:
+                file.seek(offset)
+                file.truncate()
+                try:
+                    received = receive_file(pasv_con, file, self.block_size)
+                except OSError:
+                    file.truncate(file.tell())
+                    pasv_con.close()
+                    self.connection.get_response()
+                    print(f'Error: Could not download the file {remote_file}.')
+                    return False
             response = self.connection.get_response()
-            if response and response['code'] == '550':
-                pasv_con.close()
-                print(f'Error: Could not download the file {remote_file}.')
-                return False
             pasv_con.close()
             self.connection.server.settimeout(20)
+            if not response or response['error']:
+                print(f'Error: Could not download the file {remote_file}.')
+                return False
+            if resume and size is not None and offset + received != size:
+                print(f'Error: Downloaded {offset + received} of {size} bytes of the file '
+                      f'{remote_file}.')
+                return False
             return True
         return False
 
-    async def download_directory(self, remote_dir, local_dir):
+    def _download_segmented(self, remote_file, local_file, size, segments):
+        """
+        Downloads a file as byte ranges on parallel pooled sessions.
+
+        The ranges are written at their offsets into a preallocated ".part" file, which
+        replaces the local file only once every range is complete and is removed otherwise,
+        so a failed download never leaves a full-length file that resume would trust. A range
+        is fetched with REST and RETR, and the transfer is aborted once the range is complete.
+
+        :param remote_file: file to download from the server
+        :param local_file: file to save on the local machine
+        :param size: size of the remote file
+        :param segments: maximum number of ranges
+        :return: True if every range was downloaded, False otherwise
+        """
+        segments = max(1, min(segments, size // self.MIN_SEGMENT_SIZE))
+        segment_size = -(-size // segments)
+        ranges = [(start, min(segment_size, size - start))
+                  for start in range(0, size, segment_size)]
+        part_file = local_file + '.part'
+        with open(part_file, 'wb') as file:
+            preallocate(file, size)
+        pool = self.session_pool(len(ranges))
+
+        def fetch(start, length):
+            session = pool.acquire()
+            if session is None:
+                return False
+            try:
+                downloaded = session._download_range(remote_file, part_file, start, length,
+                                                     start + length < size)
+            except (OSError, SystemExit):
+                pool.release(session, discard=True)
+                return False
+            pool.release(session, discard=not downloaded)
+            return downloaded
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            results = list(executor.map(lambda item: fetch(*item), ranges))
+        if not all(results):
+            os.remove(part_file)
+            print(f'Error: Could not download the file {remote_file}.')
+            return False
+        os.replace(part_file, local_file)
+        return True
+
+    def _download_range(self, remote_file, local_file, start, length, abort):
+        """
+        Downloads `length` bytes of a remote file from `start` into the same range of an
+        existing local file.
+
+        :param remote_file: file to download from the server
+        :param local_file: preallocated file on the local machine
+        :param start: offset of the range
+        :param length: length of the range
+        :param abort: whether the range ends before the end of the file, so the transfer
+                      has to be aborted with ABOR
+        :return: True if the range was downloaded, False otherwise
+        """
+        self.connection.server.settimeout(120)
+        pasv_con = self._create_data_con()
+        if not pasv_con:
+            return False
+        if start:
+            self.connection.send_request(f'REST {start}')
+            response = self.connection.get_response()
+            if not response or response['code'] != '350':
+                pasv_con.close()
+                return False
+        self.connection.send_request('RETR ' + remote_file)
+        response = self.connection.get_response()
+        if not response or response['code'] not in ('125', '150'):
+            pasv_con.close()
+            return False
+        with open(local_file, 'r+b') as file:
+            file.seek(start)
+            try:
+                received = receive_file(pasv_con, file, self.block_size, length)
+            finally:
+                pasv_con.close()
+        if abort:
+            # The server answers both the interrupted RETR (426, or 226 if it had already
+            # sent everything) and the ABOR itself.
+            self.connection.send_request('ABOR')
+            self.connection.get_response()
+            response = self.connection.get_response()
+            if not response or response['error']:
+                return False
+        else:
+            response = self.connection.get_response()
+            if not response or response['error']:
+                return False
+        self.connection.server.settimeout(20)
+        return received == length
+
+    async def download_directory(self, remote_dir, local_dir, resume=False):
         """
         Downloads a whole directory recursively from the remote server to the local machine.
 
         :param remote_dir: directory to download from the server
         :param local_dir: directory to save files on the local machine
+        :param resume: whether to continue interrupted downloads of files
         :return: None
         """
         if not os.path.exists(local_dir):
             os.makedirs(local_dir)
-        files = self.list(remote_dir, False, False)
-        for line in files:
-            fields = line.split()
-            name = fields[-1]
-            path = os.path.join(remote_dir, name).replace('\\', '/')
-            if line.startswith('d'):
-                await self.download_directory(path, os.path.join(local_dir, name)
-                                              .replace('\\', '/'))
-            else:
-                local_file_path = os.path.join(local_dir, name).replace('\\', '/')
+        for entry in self.entries(remote_dir):
+            path = os.path.join(remote_dir, entry.name).replace('\\', '/')
+            if entry.is_dir:
+                await self.download_directory(path, os.path.join(local_dir, entry.name)
+                                              .replace('\\', '/'), resume)
+            elif entry.type == 'file':
+                local_file_path = os.path.join(local_dir, entry.name).replace('\\', '/')
                 await asyncio.get_running_loop().run_in_executor(None, self.download_file, path,
-                                                                 local_file_path)
+                                                                 local_file_path, entry.size,
+                                                                 resume)
+
+    async def download_directory_parallel(self, remote_dir, local_dir, workers=4, resume=False):
+        """
+        Downloads a whole directory recursively, transferring up to `workers` files at once.
 
-    def download(self, remote_dir: str, local_dir: str) -> None:
+        The recursive listing runs on this client's connection and fills a bounded work
+        queue, which the workers drain, each on its own session from `session_pool`.
+
+        :param remote_dir: directory to download from the server
+        :param local_dir: directory to save files on the local machine
+        :param workers: number of files to download concurrently
+        :param resume: whether to continue interrupted downloads of files
+        :return: True if every file was downloaded, False otherwise
+        """
+        loop = asyncio.get_running_loop()
+        pool = self.session_pool(workers)
+        queue = asyncio.Queue(maxsize=workers * 2)
+        failed = []
+        with ThreadPoolExecutor(max_workers=workers + 1) as executor:
+            sessions = await asyncio.gather(
+                *(loop.run_in_executor(executor, pool.acquire) for _ in range(workers)))
+            sessions = [session for session in sessions if session is not None]
+            if not sessions:
+                print(f'Error: Could not open a session to download the directory {remote_dir}.')
+                return False
+
+            async def walk(remote_path, local_path):
+                if not os.path.exists(local_path):
+                    os.makedirs(local_path)
+                entries = await loop.run_in_executor(executor, self.entries, remote_path)
+                for entry in entries:
+                    path = os.path.join(remote_path, entry.name).replace('\\', '/')
+                    target = os.path.join(local_path, entry.name).replace('\\', '/')
+                    if entry.is_dir:
+                        await walk(path, target)
+                    elif entry.type == 'file':
+                        await queue.put((path, target, entry.size, resume))
+
+            async def work(session):
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    if session is None:
+                        failed.append(item[0])
+                        continue
+                    try:
+                        if not await loop.run_in_executor(executor, session.download_file,
+                                                          *item):
+                            failed.append(item[0])
+                    except (OSError, SystemExit):
+                        failed.append(item[0])
+                        pool.release(session, discard=True)
+                        session = await loop.run_in_executor(executor, pool.acquire)
+                if session is not None:
+                    pool.release(session)
+
+            tasks = [asyncio.create_task(work(session)) for session in sessions]
+            try:
+                await walk(remote_dir, local_dir)
+            finally:
+                for _ in tasks:
+                    await queue.put(None)
+                await asyncio.gather(*tasks)
+        if failed:
+            print(f'Error: Could not download {len(failed)} files from {remote_dir}.')
+        return not failed
+
+    def download(self, remote_dir: str, local_dir: str, workers: int = 1,
+                 resume: bool = False, segments: int = 1) -> None:
         """
         Downloads a file or directory from the remote server to the local machine.
 
         :param remote_dir: file or directory to download from the server
         :param local_dir: directory to save files on the local machine
+        :param workers: number of files of a directory to download concurrently
+        :param resume: whether to continue interrupted downloads of files
+        :param segments: number of byte ranges to download a single large file with
         """
         if self._check_connection() and self._check_logged_in():
-            file_list = self.list(remote_dir, False, False)
-            if len(file_list) == 1:
-                if file_list[0].startswith('d'):
-                    print(f'Downloading directory {remote_dir} to {local_dir}')
-                    local_dir = os.path.join(local_dir, os.path.basename(remote_dir.strip('/')))
-                    asyncio.run(self.download_directory(remote_dir, local_dir))
-                else:
-                    print(f'Downloading file {remote_dir} to {local_dir}')
-                    local_file = os.path.join(local_dir, os.path.basename(remote_dir))
-                    self.download_file(remote_dir, local_file)
-            elif len(file_list) > 1:
+            # MLST tells a file from a directory on the control connection.
+            entry = self.mlst(remote_dir) if self._mlsd_supported else None
+            if entry is not None:
+                is_dir = entry.is_dir
+            else:
+                file_list = self._list_lines(remote_dir)
+                if not file_list:
+                    print(f'No such file or directory: {remote_dir}')
+                    self.connection.close()
+                    quit()
+                entry = parse_list_line(file_list[0]) if len(file_list) == 1 else None
+                is_dir = len(file_list) > 1 or (entry is not None and entry.is_dir)
+                if is_dir:
+                    self._cache_list_lines(remote_dir, file_list)
+            if is_dir:
                 print(f'Downloading directory {remote_dir} to {local_dir}')
                 local_dir = os.path.join(local_dir, os.path.basename(remote_dir.strip('/')))
-                asyncio.run(self.download_directory(remote_dir, local_dir))
+                self._download_directory(remote_dir, local_dir, workers, resume)
             else:
-                print(f'No such file or directory: {remote_dir}')
-                self.connection.close()
-                quit()
+                print(f'Downloading file {remote_dir} to {local_dir}')
+                local_file = os.path.join(local_dir, os.path.basename(remote_dir))
+                self.download_file(remote_dir, local_file, entry.size if entry else None,
+                                   resume, segments)
         print('Download complete.')
 
+    def _list_lines(self, directory: str) -> list:
+        """
+        Lists a directory with STAT where `listing_mode` allows it, and with LIST otherwise.
+        """
+        lines = self._stat_list_lines(directory)
+        return lines if lines is not None else self.list(directory, False, False)
+
+    def _cache_list_lines(self, directory: str, lines: list) -> None:
+        """
+        Stores a LIST listing of a directory that was already received in `listing_cache`,
+        unless the server is known to support MLSD, whose listings carry more facts.
+        """
+        if self._mlsd_supported is not True:
+            self.listing_cache.put(directory, [
+                entry for entry in map(parse_list_line, lines)
+                if entry and entry.name not in ('.', '..')])
+
+    def _download_directory(self, remote_dir: str, local_dir: str, workers: int,
+                            resume: bool) -> None:
+        """
+        Runs the sequential or the parallel directory download.
+        """
+        if workers > 1:
+            asyncio.run(self.download_directory_parallel(remote_dir, local_dir, workers, resume))
+        else:
+            asyncio.run(self.download_directory(remote_dir, local_dir, resume))
+
+    def sync(self, local_dir: str, remote_dir: str, download: bool = False,
+             delete: bool = False, workers: int = 1) -> bool:
+        """
+        Mirrors a local directory to a remote directory, or the remote one to the local one,
+        transferring only the files that are new or changed.
+
+        A file has changed when its size differs or the source copy is newer than the target
+        copy. Remote sizes and modification times come from the listings, facts a listing
+        lacks are requested with SIZE and MDTM. Downloaded files get the remote modification
+        time, so they are not transferred again on the next run.
+
+        :param local_dir: local directory to synchronize
+        :param remote_dir: remote directory to synchronize
+        :param download: whether to mirror the remote directory to the local one
+        :param delete: whether to delete the target files and directories that no longer
+                       exist at the source
+        :param workers: number of files to transfer concurrently
+        :return: True if the directories were synchronized, False otherwise
+        """
+        if not (self._check_connection() and self._check_logged_in()):
+            return False
+        remote_dir = remote_dir.rstrip('/') or '/'
+        if (not download or os.path.exists(local_dir)) and not os.path.isdir(local_dir):
+            print(f'Error: {local_dir} is not a directory.')
+            return False
+        local_files, local_dirs = self._walk_local(local_dir)
+        remote_skipped = set()
+        remote_files, remote_dirs = self._walk_remote(remote_dir, remote_skipped)
+        if download and delete and not remote_files and not remote_dirs and \
+                not remote_skipped:
+            print(f'Error: {remote_dir} is empty or does not exist, nothing was deleted.')
+            return False
+        if download:
+            synchronized = self._sync_download(local_dir, remote_dir, local_files, local_dirs,
+                                               remote_files, remote_dirs, delete, workers,
+                                               remote_skipped)
+        else:
+            synchronized = self._sync_upload(local_dir, remote_dir, local_files, local_dirs,
+                                             remote_files, remote_dirs, delete, workers)
+        if synchronized:
+            print('Sync complete.')
+        else:
+            print('Sync finished with errors.')
+        return synchronized
+
+    def _sync_upload(self, local_dir, remote_dir, local_files, local_dirs, remote_files,
+                     remote_dirs, delete, workers) -> bool:
+        """
+        Uploads the new and changed files of a sync and deletes the remote leftovers.
+        """
+        self._complete_facts(remote_dir, remote_files)
+        changed = []
+        for name, (size, modify) in sorted(local_files.items()):
+            entry = remote_files.get(name)
+            if entry is None or entry.size != size or \
+                    (entry.modify is not None and modify > entry.modify + self.SYNC_TOLERANCE):
+                changed.append((os.path.join(local_dir, name).replace('\\', '/'),
+                                self._join_remote(remote_dir, name)))
+        parents = [remote_dir[:index] for index in range(1, len(remote_dir))
+                   if remote_dir[index] == '/']
+        self.make_directories(parents + [remote_dir] + [
+            self._join_remote(remote_dir, name) for name in sorted(local_dirs - remote_dirs)])
+        print(f'Uploading {len(changed)} new or changed files to {remote_dir}')
+        if workers > 1:
+            synchronized = self._upload_files_parallel(changed, workers)
+        else:
+            synchronized = True
+            for local_file, remote_file in changed:
+                synchronized = self.upload_file(local_file, remote_file, make_dirs=False) \
+                    and synchronized
+        if delete:
+            for name in sorted(set(remote_files) - set(local_files)):
+                synchronized = self.delete_file(self._join_remote(remote_dir, name)) \
+                    and synchronized
+            for name in sorted(remote_dirs - local_dirs, key=len, reverse=True):
+                synchronized = self.remove_directory(self._join_remote(remote_dir, name)) \
+                    and synchronized
+        return synchronized
+
+    def _sync_download(self, local_dir, remote_dir, local_files, local_dirs, remote_files,
+                       remote_dirs, delete, workers, remote_skipped=()) -> bool:
+        """
+        Downloads the new and changed files of a sync and deletes the local leftovers.
+
+        Local files where the remote tree has a directory are replaced in delete mode and
+        fail the sync otherwise. The local counterparts of remote entries that were not
+        synchronized, such as symbolic links, are never deleted.
+        """
+        self._complete_facts(remote_dir, remote_files)
+        synchronized = True
+        blocked = []
+        for name in [''] + sorted(remote_dirs):
+            path = os.path.join(local_dir, name)
+            if any(name.startswith(parent + '/') for parent in blocked):
+                continue
+            if os.path.lexists(path) and not os.path.isdir(path):
+                if not delete:
+                    print(f'Error: {path} is not a directory.')
+                    blocked.append(name)
+                    synchronized = False
+                    continue
+                os.remove(path)
+                local_files.pop(name, None)
+            os.makedirs(path, exist_ok=True)
+        changed = []
+        for name, entry in sorted(remote_files.items()):
+            if any(name.startswith(parent + '/') for parent in blocked):
+                continue
+            size, modify = local_files.get(name, (None, None))
+            if size is None or entry.size != size or \
+                    (entry.modify is not None and entry.modify > modify + self.SYNC_TOLERANCE):
+                changed.append((self._join_remote(remote_dir, name),
+                                os.path.join(local_dir, name), entry))
+        print(f'Downloading {len(changed)} new or changed files from {remote_dir}')
+
+        def fetch(session, item):
+            remote_file, local_file, entry = item
+            if os.path.isdir(local_file):
+                print(f'Error: {local_file} is a directory.')
+                return False
+            if not session.download_file(remote_file, local_file, entry.size):
+                return False
+            if entry.modify is not None:
+                os.utime(local_file, (entry.modify, entry.modify))
+            return True
+
+        if workers > 1:
+            failed = self._run_parallel(changed, workers, fetch)
+            if failed:
+                print(f'Error: Could not download {len(failed)} files.')
+            synchronized = not failed and synchronized
+        else:
+            for item in changed:
+                synchronized = fetch(self, item) and synchronized
+        if delete:
+            def kept(name):
+                return any(name == skipped or name.startswith(skipped + '/')
+                           for skipped in remote_skipped)
+
+            for name in sorted(set(local_files) - set(remote_files)):
+                if not kept(name):
+                    os.remove(os.path.join(local_dir, name))
+            for name in sorted(local_dirs - remote_dirs, key=len, reverse=True):
+                if kept(name):
+                    continue
+                try:
+                    os.rmdir(os.path.join(local_dir, name))
+                except OSError:
+                    print(f'Error: Could not remove the directory {name}.')
+                    synchronized = False
+        return synchronized
+
+    def _walk_local(self, local_dir: str):
+        """
+        Collects the files of a local tree with their size and modification time.
+
+        :return: A dictionary mapping the relative path of every file to a (size, modify)
+                 tuple, and the set of the relative paths of the directories.
+        """
+        files, directories = {}, set()
+        for root, dir_names, file_names in os.walk(local_dir):
+            relative_root = os.path.relpath(root, local_dir).replace('\\', '/')
+            prefix = '' if relative_root == '.' else relative_root + '/'
+            directories.update(prefix + dir_name for dir_name in dir_names)
+            for file_name in file_names:
+                stat = os.stat(os.path.join(root, file_name))
+                files[prefix + file_name] = (stat.st_size, stat.st_mtime)
+        return files, directories
+
+    def _walk_remote(self, remote_dir: str, skipped: set = None):
+        """
+        Collects the files of a remote tree with `entries`.
+
+        :param skipped: A set to add the relative paths of the entries that are neither files
+                        nor directories to, such as symbolic links.
+        :return: A dictionary mapping the relative path of every file to its FtpEntry, and
+                 the set of the relative paths of the directories.
+        """
+        files, directories = {}, set()
+        pending = ['']
+        while pending:
+            relative = pending.pop()
+            for entry in self.entries(self._join_remote(remote_dir, relative)):
+                name = relative + '/' + entry.name if relative else entry.name
+                if entry.is_dir:
+                    directories.add(name)
+                    pending.append(name)
+                elif entry.type == 'file':
+                    files[name] = entry
+                elif skipped is not None and entry.type not in ('cdir', 'pdir'):
+                    skipped.add(name)
+        return files, directories
+
+    def _complete_facts(self, remote_dir: str, remote_files: dict) -> None:
+        """
+        Requests the sizes and modification times a listing did not report, pipelined.
+        """
+        incomplete = [name for name, entry in remote_files.items()
+                      if entry.size is None or entry.modify is None]
+        if not incomplete:
+            return
+        stats = self.stat_files([self._join_remote(remote_dir, name) for name in incomplete])
+        for name in incomplete:
+            entry = remote_files[name]
+            facts = stats.get(self._join_remote(remote_dir, name), {})
+            remote_files[name] = entry._replace(
+                size=entry.size if entry.size is not None else facts.get('size'),
+                modify=entry.modify if entry.modify is not None else facts.get('modify'))
+
+    @staticmethod
+    def _join_remote(remote_dir: str, name: str) -> str:
+        """
+        Joins a relative path to a remote directory.
+        """
+        if not name:
+            return remote_dir
+        return remote_dir.rstrip('/') + '/' + name
+
+    def fxp(self, target, source_path: str, target_path: str) -> bool:
+        """
+        Copies a file or directory from this server to another one with FXP, so the data
+        flows directly between the servers instead of through this client.
+
+        :param target: The logged-in FtpClient of the target server.
+        :param source_path: file or directory on this server
+        :param target_path: path to copy it to on the target server
+        :return: True if everything was copied, False otherwise
+        """
+        if not (self._check_connection() and self._check_logged_in()):
+            return False
+        source_path = source_path.rstrip('/') or '/'
+        target_path = target_path.rstrip('/') or '/'
+        source_type = self._remote_type(source_path)
+        if source_type is None:
+            print(f'No such file or directory: {source_path}')
+            return False
+        if source_type != 'dir':
+            print(f'Copying file {source_path} to {target.host}:{target_path}')
+            copied = self.fxp_file(target, source_path, target_path)
+        else:
+            files, directories = self._walk_remote(source_path)
+            print(f'Copying directory {source_path} to {target.host}:{target_path}')
+            target.make_directories([target_path] + [
+                self._join_remote(target_path, name) for name in sorted(directories)])
+            copied = True
+            for name in sorted(files):
+                copied = self.fxp_file(target, self._join_remote(source_path, name),
+                                       self._join_remote(target_path, name)) and copied
+        if copied:
+            print('FXP transfer complete.')
+        else:
+            print('FXP transfer finished with errors.')
+        return copied
+
+    def _remote_type(self, path: str):
+        """
+        Tells a remote file from a directory, with MLST where the server supports it and
+        from the listing of the parent directory otherwise.
+
+        :param path: The remote path, without a trailing slash.
+        :return: The type of the entry as in FtpEntry, or None if it does not exist.
+        """
+        if path == '/':
+            return 'dir'
+        if self._supports('MLST'):
+            entry = self.mlst(path)
+            if entry:
+                return entry.type
+        parent, _, name = path.rpartition('/')
+        if path.startswith('/') and not parent:
+            parent = '/'
+        for entry in self.entries(parent):
+            if entry.name == name:
+                return entry.type
+        return None
+
+    def fxp_file(self, target, source_file: str, target_file: str) -> bool:
+        """
+        Copies a single file from this server to another one with FXP: this server listens
+        after PASV, the target server is told to connect to it with PORT, and RETR here is
+        paired with STOR there. Both servers must allow data connections from a foreign
+        address, and both sessions must use the same transfer mode.
+
+        A server that does not answer within `FXP_TIMEOUT` fails only this file: its
+        connection is closed and the other server's transfer is aborted. If the source
+        refuses RETR, the target's STOR is aborted at once instead of waiting for data.
+
+        :param target: The logged-in FtpClient of the target server.
+        :param source_file: file on this server
+        :param target_file: file to create on the target server
+        :return: True if the file was copied, False otherwise
+        """
+        if not (self._check_connection() and self._check_logged_in() and
+                target._check_connection() and target._check_logged_in()):
+            return False
+        if self.compression_level != target.compression_level:
+            print('Error: FXP needs the same transfer mode on both servers.')
+            return False
+        self.connection.send_request('PASV')
+        response = self.connection.get_response()
+        if not response or response['code'] != '227':
+            print(f'Error: {self.host} refused to open a data port for FXP.')
+            return False
+        target.connection.send_request('PORT ' +
+                                       response['message'].partition('(')[2].partition(')')[0])
+        response = target.connection.get_response()
+        if not response or response['code'] != '200':
+            print(f'Error: {target.host} refused to connect to {self.host} for FXP.')
+            return False
+        target.connection.send_request('STOR ' + target_file)
+        self.connection.send_request('RETR ' + source_file)
+        target.listing_cache.invalidate(target_file)
+        self.connection.server.settimeout(self.FXP_TIMEOUT)
+        target.connection.server.settimeout(self.FXP_TIMEOUT)
+        try:
+            source_reply = self.connection.get_response(exit_on_timeout=False)
+            if not source_reply or source_reply['code'] not in ('125', '150'):
+                # The target may already be connected to the data port, waiting for data
+                # that never comes.
+                self._abort_fxp_store(target, target_file)
+            else:
+                target_reply = target.connection.get_response(exit_on_timeout=False)
+                if not target_reply or target_reply['code'] not in ('125', '150'):
+                    # Nobody connects to the data port.
+                    self._abort_transfer(self)
+                else:
+                    source_reply = self.connection.get_response(exit_on_timeout=False)
+                    if not source_reply:
+                        self._abort_transfer(target)
+                        if target.connection.connected:
+                            target.delete_file(target_file)
+                    else:
+                        target_reply = target.connection.get_response(exit_on_timeout=False)
+                        if not source_reply['error'] and target_reply and \
+                                not target_reply['error']:
+                            return True
+        finally:
+            if self.connection.connected:
+                self.connection.server.settimeout(20)
+            if target.connection.connected:
+                target.connection.server.settimeout(20)
+        print(f'Error: Could not copy the file {source_file} to {target.host}:{target_file}.')
+        return False
+
+    @staticmethod
+    def _abort_transfer(client) -> None:
+        """
+        Aborts a transfer whose final reply is still pending; the server answers both the
+        transfer and the ABOR. A reply timeout closes the connection instead of exiting.
+        """
+        if client.connection.connected:
+            client.connection.send_request('ABOR')
+            for _ in range(2):
+                if not client.connection.get_response(exit_on_timeout=False):
+                    break
+
+    def _abort_fxp_store(self, target, target_file: str) -> None:
+        """
+        Aborts the STOR of an FXP transfer whose source failed, and deletes the empty or
+        partial file it may have created.
+        """
+        if not target.connection.connected:
+            return
+        target.connection.send_request('ABOR')
+        reply = target.connection.get_response(exit_on_timeout=False)
+        started = reply and reply['code'] in ('125', '150')
+        for _ in range(2 if started else 1):
+            if not target.connection.get_response(exit_on_timeout=False):
+                return
+        if started:
+            target.delete_file(target_file)
+
     def _check_connection(self) -> bool:
         """
         Checks whether the client is connected to an FTP server
@@ -0,0 +1,151 @@
+"""
+FTP Listing module.
+
+This module provides the entry type of FTP directory listings and the parsers for MLSD/MLST
+(RFC 3659) and for the Unix and DOS style LIST formats.
+"""
+import calendar
+import time
+from typing import NamedTuple, Optional
+
+MONTHS = {month: number for number, month in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
+
+class FtpEntry(NamedTuple):
+    """
+    A single entry of a remote directory.
+
+    A named tuple keeps the per-entry memory at a few pointers, so listings with millions of
+    entries stay affordable.
+
+    :ivar name (str): The name of the entry (the full path for MLST).
+    :ivar type (str): 'file', 'dir', 'link', or the server's own type for other entries.
+    :ivar size (int): The size in bytes, None if unknown.
+    :ivar modify (float): The modification time as a UTC timestamp, None if unknown.
+    :ivar unique (str): The server's unique id of the entry, None if unknown.
+    """
+    name: str
+    type: str
+    size: Optional[int] = None
+    modify: Optional[float] = None
+    unique: Optional[str] = None
+
+    @property
+    def is_dir(self) -> bool:
+        """
+        Whether the entry is a directory.
+        """
+        return self.type == 'dir'
+
+
+def parse_time_val(value: str):
+    """
+    Converts an RFC 3659 time-val (YYYYMMDDHHMMSS[.sss], always in UTC) to a timestamp.
+
+    :param value: The time-val as reported by MDTM or MLSD.
+
+    :return: The UTC timestamp, or None if the value is malformed.
+    """
+    value = value.strip()
+    try:
+        seconds = calendar.timegm(time.strptime(value[:14], '%Y%m%d%H%M%S'))
+    except ValueError:
+        return None
+    fraction = value[15:] if value[14:15] == '.' else ''
+    return seconds + (float('0.' + fraction) if fraction.isdigit() else 0)
+
+
+def parse_mlsx_line(line: str):
+    """
+    Parses one line of an MLSD listing or of an MLST reply, "fact=value;... name".
+
+    :param line: The line, without its line terminator.
+
+    :return: The FtpEntry, or None for lines that are not entries.
+    """
+    facts_text, separator, name = line.lstrip(' ').partition(' ')
+    if not separator or not name:
+        return None
+    facts = {}
+    for fact in facts_text.split(';'):
+        key, _, value = fact.partition('=')
+        if key:
+            facts[key.lower()] = value
+    entry_type = facts.get('type', '').lower()
+    if entry_type.startswith('os.unix=slink') or entry_type.startswith('os.unix=symlink'):
+        entry_type = 'link'
+    size = facts.get('size', facts.get('sizd', ''))
+    modify = facts.get('modify')
+    return FtpEntry(name, entry_type or 'file', int(size) if size.isdigit() else None,
+                    parse_time_val(modify) if modify else None, facts.get('unique'))
+
+
+def parse_list_line(line: str):
+    """
+    Parses one line of a Unix style or DOS style LIST listing.
+
+    Names may contain spaces, and symbolic links lose their " -> target" suffix. LIST times
+    are in the server's time zone and are treated as UTC.
+
+    :param line: The line, without its line terminator.
+
+    :return: The FtpEntry, or None for lines that are not entries, such as "total 12".
+    """
+    fields = line.split(None, 8)
+    if len(fields) == 9 and fields[0][:1] in 'd-lbcps' and fields[4].isdigit():
+        entry_type = {'d': 'dir', '-': 'file', 'l': 'link'}.get(fields[0][0], fields[0][0])
+        name = fields[8]
+        if entry_type == 'link' and ' -> ' in name:
+            name = name.split(' -> ', 1)[0]
+        return FtpEntry(name, entry_type, int(fields[4]),
+                        _parse_list_time(fields[5], fields[6], fields[7]))
+    fields = line.split(None, 3)
+    if len(fields) == 4 and fields[0][:1].isdigit() and fields[1][:1].isdigit():
+        modify = _parse_dos_time(fields[0], fields[1])
+        if fields[2].upper() == '<DIR>':
+            return FtpEntry(fields[3], 'dir', None, modify)
+        if fields[2].isdigit():
+            return FtpEntry(fields[3], 'file', int(fields[2]), modify)
+    return None
+
+
+def _parse_list_time(month: str, day: str, time_or_year: str):
+    """
+    Converts the "May 1 10:00" or "May 1 2022" date of a Unix LIST line to a timestamp.
+    Dates without a year are within the last twelve months.
+    """
+    month_number = MONTHS.get(month[:3].lower())
+    if month_number is None or not day.isdigit():
+        return None
+    hour, minute, year = 0, 0, None
+    if ':' in time_or_year:
+        hour_text, _, minute_text = time_or_year.partition(':')
+        if not hour_text.isdigit() or not minute_text.isdigit():
+            return None
+        hour, minute = int(hour_text), int(minute_text)
+    elif time_or_year.isdigit():
+        year = int(time_or_year)
+    else:
+        return None
+    now = time.gmtime()
+    if year is None:
+        year = now.tm_year if (month_number, int(day)) <= (now.tm_mon, now.tm_mday) \
+            else now.tm_year - 1
+    try:
+        return calendar.timegm((year, month_number, int(day), hour, minute, 0, 0, 0, 0))
+    except (ValueError, OverflowError):
+        return None
+
+
+def _parse_dos_time(date: str, clock: str):
+    """
+    Converts the "05-01-23" and "10:00AM" fields of a DOS LIST line to a timestamp.
+    """
+    for date_format in ('%m-%d-%y %I:%M%p', '%m-%d-%Y %I:%M%p', '%m-%d-%y %H:%M',
+                        '%m-%d-%Y %H:%M'):
+        try:
+            return calendar.timegm(time.strptime(f'{date} {clock.upper()}', date_format))
+        except ValueError:
+            continue
+    return None
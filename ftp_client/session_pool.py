@@ -0,0 +1,195 @@
+"""
+FTP Session Pool module.
+
+This module provides a pool of authenticated FTP sessions that can be shared by workers.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from ftp_client.ftpclient import FtpClient
+
+
+class FtpSessionPool:
+    """
+    Keeps up to `size` logged-in FtpClient sessions to one server and lends them to workers.
+
+    Sessions that were idle for longer than `check_interval` seconds are health-checked
+    with NOOP when checked out, and dead ones are transparently replaced by new ones.
+
+    :ivar size (int): The maximum number of sessions the pool opens.
+    :ivar check_interval (float): The idle time after which a session is health-checked.
+    """
+
+    def __init__(self, host: str, user: str, password: str, size: int = 4,
+                 check_interval: float = 15.0, session_factory=FtpClient):
+        """
+        Initializes an empty pool, sessions are opened on demand or by `warm_up`.
+
+        :param host: The hostname or IP address of the FTP server.
+        :param user: The username to authenticate with.
+        :param password: The password to authenticate with.
+        :param size: The maximum number of sessions to keep.
+        :param check_interval: Idle time in seconds after which a session is checked with NOOP.
+        :param session_factory: Callable creating a new, not yet connected session.
+        """
+        self.host = host
+        self.user = user
+        self._password = password
+        self.size = max(1, size)
+        self.check_interval = check_interval
+        self._session_factory = session_factory
+        self._idle = deque()
+        self._opened = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def warm_up(self, count: int = None) -> int:
+        """
+        Opens sessions in parallel until `count` (by default `size`) of them are idle.
+
+        :param count: The number of idle sessions to have ready.
+
+        :return: The number of sessions that were opened.
+        """
+        count = self.size if count is None else min(count, self.size)
+        with self._condition:
+            missing = min(count - len(self._idle), self.size - self._opened)
+            self._opened += max(0, missing)
+        if missing <= 0:
+            return 0
+        with ThreadPoolExecutor(max_workers=missing) as executor:
+            sessions = list(executor.map(lambda _: self._open_session(), range(missing)))
+        with self._condition:
+            for session in sessions:
+                if session is None:
+                    self._opened -= 1
+                else:
+                    self._idle.append((session, time.monotonic()))
+            self._condition.notify_all()
+        return sum(session is not None for session in sessions)
+
+    def acquire(self, timeout: float = None):
+        """
+        Checks a logged-in session out of the pool, opening a new one if none is idle.
+
+        :param timeout: How long to wait for a session to be released when the pool is
+                        exhausted, None to wait forever.
+
+        :return: An FtpClient, or None if no session could be obtained.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                if self._idle:
+                    session, last_used = self._idle.pop()
+                    break
+                if self._opened < self.size:
+                    self._opened += 1
+                    session, last_used = None, None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+        if session is not None and time.monotonic() - last_used >= self.check_interval:
+            if not session.connection.is_alive():
+                self._discard(session)
+                session = None
+        if session is None:
+            session = self._open_session()
+        if session is None:
+            with self._condition:
+                self._opened -= 1
+                self._condition.notify()
+        return session
+
+    def release(self, session, discard: bool = False) -> None:
+        """
+        Returns a session to the pool.
+
+        :param session: A session obtained from `acquire`.
+        :param discard: Whether the session is unusable and must be closed instead,
+                        e.g. after an aborted transfer.
+        """
+        if discard or self._closed or not session.connection.connected:
+            self._discard(session)
+            with self._condition:
+                self._opened -= 1
+                self._condition.notify()
+            return
+        with self._condition:
+            self._idle.append((session, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def session(self, timeout: float = None):
+        """
+        Checks a session out for the duration of a `with` block.
+
+        A session is discarded if the block raises, since its control connection may be
+        left in the middle of a reply.
+
+        :param timeout: How long to wait for a session, see `acquire`.
+        """
+        session = self.acquire(timeout)
+        if session is None:
+            raise ConnectionError(f'Error: Could not open a session to {self.host}.')
+        try:
+            yield session
+        except BaseException:
+            self.release(session, discard=True)
+            raise
+        self.release(session)
+
+    def close(self) -> None:
+        """
+        Closes all idle sessions, sessions that are checked out are closed on release.
+        """
+        with self._condition:
+            self._closed = True
+            idle = [session for session, _ in self._idle]
+            self._idle.clear()
+            self._opened -= len(idle)
+            self._condition.notify_all()
+        for session in idle:
+            self._discard(session)
+
+    def _open_session(self):
+        """
+        Opens and authenticates a new session. The connection of a session that fails to
+        log in, including by a reply timeout, is closed.
+
+        :return: The logged-in session, or None if the login failed.
+        """
+        session = self._session_factory()
+        try:
+            if session.login(self.host, self.user, self._password):
+                return session
+        except (OSError, SystemExit):
+            pass
+        session.connection.close()
+        return None
+
+    @staticmethod
+    def _discard(session) -> None:
+        """
+        Closes a session, ignoring errors from a connection that is already broken.
+        """
+        try:
+            if session.connection.connected:
+                session.connection.send_request('QUIT')
+                session.connection.close()
+        except OSError:
+            session.connection.close()
+        session.logged_in = False
@@ -0,0 +1,152 @@
+"""
+FTP Transfer module.
+
+This module provides the functions that move file data over FTP data connections.
+"""
+import os
+import zlib
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+
+
+def send_file(data_con, file, offset: int = 0, block_size: int = DEFAULT_BLOCK_SIZE) -> int:
+    """
+    Streams a file to a data connection with constant memory.
+
+    The kernel's zero-copy sendfile is used where the platform and the socket support it,
+    otherwise the file is sent in chunks with sendall.
+
+    :param data_con: The connected data socket.
+    :param file: The file object opened in binary mode.
+    :param offset: The position in the file to start sending from.
+    :param block_size: The chunk size of the fallback.
+
+    :return: The number of bytes sent.
+    """
+    try:
+        return data_con.sendfile(file, offset)
+    except (AttributeError, ValueError, NotImplementedError):
+        pass
+    file.seek(offset)
+    sent = 0
+    while True:
+        chunk = file.read(block_size)
+        if not chunk:
+            return sent
+        data_con.sendall(chunk)
+        sent += len(chunk)
+
+
+def receive_file(data_con, file, block_size: int = DEFAULT_BLOCK_SIZE, limit: int = None) -> int:
+    """
+    Writes everything received on a data connection to a file.
+
+    Data is received straight into one reused buffer, so a transfer costs one recv_into
+    and one write per block instead of a new bytes object per chunk.
+
+    :param data_con: The connected data socket.
+    :param file: The file object opened in binary mode.
+    :param block_size: The size of the receive buffer.
+    :param limit: The number of bytes after which to stop, None to read until the server
+                  closes the data connection.
+
+    :return: The number of bytes received.
+    """
+    view = memoryview(bytearray(block_size))
+    received = 0
+    while limit is None or received < limit:
+        wanted = block_size if limit is None else min(block_size, limit - received)
+        count = data_con.recv_into(view, wanted)
+        if not count:
+            break
+        file.write(view[:count])
+        received += count
+    return received
+
+
+def preallocate(file, size: int) -> None:
+    """
+    Reserves disk space for a file that is about to be written, so its blocks are allocated
+    once instead of growing the file on every write. The file ends up `size` bytes long.
+
+    :param file: The file object opened for writing.
+    :param size: The expected size of the file in bytes.
+    """
+    try:
+        os.posix_fallocate(file.fileno(), 0, size)
+    except (AttributeError, OSError):
+        file.truncate(size)
+
+
+class DeflateConnection:
+    """
+    Wraps a data connection in MODE Z, the deflate transfer mode of FTP.
+
+    Data is compressed and decompressed as a stream, block by block, and the wrapper offers
+    the socket methods the transfer functions use, so they work unchanged on it.
+
+    :ivar level (int): The zlib compression level of sent data.
+    """
+
+    def __init__(self, data_con, level: int = 6):
+        """
+        Wraps a connected data socket.
+
+        :param data_con: The connected data socket.
+        :param level: The zlib compression level of sent data, from 1 to 9.
+        """
+        self.level = level
+        self._data_con = data_con
+        self._compressor = None
+        self._decompressor = zlib.decompressobj()
+        self._pending = b''
+
+    def sendall(self, data) -> None:
+        """
+        Compresses data and sends whatever the compressor has produced so far.
+        """
+        if self._compressor is None:
+            self._compressor = zlib.compressobj(self.level)
+        compressed = self._compressor.compress(data)
+        if compressed:
+            self._data_con.sendall(compressed)
+
+    def recv(self, size: int) -> bytes:
+        """
+        Returns up to `size` bytes of decompressed data, b'' at the end of the stream.
+        """
+        while not self._pending:
+            tail = self._decompressor.unconsumed_tail
+            if tail:
+                self._pending = self._decompressor.decompress(tail, size)
+                continue
+            compressed = self._data_con.recv(size)
+            if not compressed:
+                self._pending = self._decompressor.flush()
+                if not self._pending:
+                    return b''
+                break
+            self._pending = self._decompressor.decompress(compressed, size)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def recv_into(self, buffer, nbytes: int = 0) -> int:
+        """
+        Receives up to `nbytes` bytes of decompressed data into a buffer.
+        """
+        data = self.recv(nbytes or len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        """
+        Sends the end of the compressed stream, if anything was sent, and closes the
+        connection.
+        """
+        try:
+            if self._compressor is not None:
+                self._data_con.sendall(self._compressor.flush())
+                self._compressor = None
+        except OSError:
+            pass
+        self._data_con.close()
@@ -18,18 +18,55 @@ from webdav_api_client.webdav_client import WebDavClient
 @click.option('-l', '--list', 'list_files', type=str, metavar='REMOTE_PATH', help='List files at '
                                                                                   'the remote '
                                                                                   'path.')
-def cli(client_type, host, user, password, token, download, upload, list_files):
+@click.option('-w', '--workers', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of files to transfer concurrently.')
+@click.option('-r', '--resume', is_flag=True, help='Continue interrupted transfers.')
+@click.option('-s', '--segments', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of connections to download a single large file with.')
+@click.option('-S', '--sync', nargs=2, type=str, metavar=('LOCAL_PATH', 'REMOTE_PATH'),
+              help='Mirror the local directory to the remote directory, transferring only new '
+                   'or changed files.')
+@click.option('--pull', is_flag=True, help='With --sync, mirror the remote directory to the '
+                                           'local directory instead.')
+@click.option('--delete', is_flag=True, help='With --sync, delete files and directories that no '
+                                             'longer exist at the source.')
+@click.option('-z', '--compress', type=click.IntRange(1, 9), metavar='LEVEL',
+              help='Compress FTP transfers with MODE Z at this zlib level (1-9).')
+@click.option('-x', '--fxp', nargs=2, type=str, metavar=('REMOTE_PATH', 'TARGET_PATH'),
+              help='Copy a file or directory from the FTP host to the target FTP host directly.')
+@click.option('--target-host', type=str, metavar='HOST', help='FTP host to copy to with --fxp.')
+@click.option('--target-user', type=str, metavar='USERNAME', help='Username on the target host.')
+@click.option('--target-pass', 'target_password', type=str, metavar='PASSWORD',
+              help='Password on the target host.')
+def cli(client_type, host, user, password, token, download, upload, list_files, workers, resume,
+        segments, sync, pull, delete, compress, fxp, target_host, target_user, target_password):
     if client_type == 'ftp':
         if not host or not user or not password:
             raise click.UsageError('For FTP client, --host, --user, and --pass are required.')
+        if fxp and (not target_host or not target_user or not target_password):
+            raise click.UsageError('For --fxp, --target-host, --target-user, and --target-pass '
+                                   'are required.')
         ftp_client = FtpClient()
         ftp_client.connect(host, user, password)
+        if compress:
+            ftp_client.enable_compression(compress)
         if download:
             remote_path, local_path = download
-            ftp_client.download(remote_path, local_path)
+            ftp_client.download(remote_path, local_path, workers=workers, resume=resume,
+                                segments=segments)
         if upload:
             local_path, remote_path = upload
-            ftp_client.upload(local_path, remote_path)
+            ftp_client.upload(local_path, remote_path, workers=workers, resume=resume)
+        if sync:
+            local_path, remote_path = sync
+            ftp_client.sync(local_path, remote_path, download=pull, delete=delete,
+                            workers=workers)
+        if fxp:
+            source_path, target_path = fxp
+            target_client = FtpClient()
+            target_client.connect(target_host, target_user, target_password)
+            ftp_client.fxp(target_client, source_path, target_path)
+            target_client.close()
         if list_files:
             remote_path = list_files
             ftp_client.list(remote_path, True, True)
@@ -46,12 +83,15 @@ def cli(client_type, host, user, password, token, download, upload, list_files):
         else:
             raise click.UsageError('For WebDav client, --user and --pass or --token are '
                                    'required.')
+        if sync or fxp:
+            raise click.UsageError('--sync and --fxp are only supported by the FTP client.')
         if download:
             remote_path, local_path = download
-            webdav_client.download(remote_path, local_path)
+            webdav_client.download(remote_path, local_path, resume=resume,
+                                   segments=segments, workers=workers)
         if upload:
             local_path, remote_path = upload
-            webdav_client.upload(local_path, remote_path)
+            webdav_client.upload(local_path, remote_path, workers=workers)
         if list_files:
             directory = list_files
             webdav_client.list_directory_recursive(directory)
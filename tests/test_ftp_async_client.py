@@ -0,0 +1,168 @@
+import asyncio
+import os
+import socket
+import tempfile
+import unittest
+
+from ftp_client.async_client import AsyncFtpClient
+
+
+class FakeFtpServer:
+    """
+    A minimal in-memory FTP server on the local host, for testing the asyncio client.
+    """
+
+    def __init__(self, files):
+        self.files = dict(files)
+        self.directories = {os.path.dirname(path) for path in self.files}
+        self.sessions = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _listing(self, directory):
+        lines = []
+        for path in sorted(self.directories):
+            if os.path.dirname(path) == directory and path != directory:
+                lines.append(f'drwxr-xr-x 2 user group 0 May 20  2022 {os.path.basename(path)}')
+        for path, data in sorted(self.files.items()):
+            if os.path.dirname(path) == directory:
+                lines.append(f'-rw-r--r-- 1 user group {len(data)} May 20  2022 '
+                             f'{os.path.basename(path)}')
+        return ''.join(line + '\r\n' for line in lines).encode()
+
+    async def _handle(self, reader, writer):
+        self.sessions += 1
+        loop = asyncio.get_running_loop()
+        listener = None
+
+        def reply(text):
+            writer.write(f'{text}\r\n'.encode())
+
+        reply('220 Welcome')
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command, _, argument = line.decode().strip().partition(' ')
+            command = command.upper()
+            if command == 'USER':
+                reply('331 Password required')
+            elif command == 'PASS':
+                reply('230 Logged in' if argument == 'password' else '530 Login incorrect')
+            elif command == 'TYPE':
+                reply('200 Type set')
+            elif command == 'MKD':
+                self.directories.add(argument)
+                reply(f'257 "{argument}" created')
+            elif command == 'PASV':
+                listener = socket.socket()
+                listener.bind(('127.0.0.1', 0))
+                listener.listen(1)
+                listener.setblocking(False)
+                port = listener.getsockname()[1]
+                reply(f'227 Entering Passive Mode (127,0,0,1,{port // 256},{port % 256})')
+            elif command in ('LIST', 'RETR', 'STOR'):
+                if command == 'RETR' and argument not in self.files:
+                    listener.close()
+                    reply('550 File not found')
+                    continue
+                reply('150 Opening data connection')
+                data_con, _ = await loop.sock_accept(listener)
+                listener.close()
+                data_con.setblocking(False)
+                if command == 'STOR':
+                    received = bytearray()
+                    while True:
+                        chunk = await loop.sock_recv(data_con, 65536)
+                        if not chunk:
+                            break
+                        received += chunk
+                    self.files[argument] = bytes(received)
+                else:
+                    data = self._listing(argument) if command == 'LIST' else self.files[argument]
+                    await loop.sock_sendall(data_con, data)
+                data_con.close()
+                reply('226 Transfer complete')
+            elif command == 'QUIT':
+                reply('221 Goodbye')
+                await writer.drain()
+                break
+            else:
+                reply('500 Unknown command')
+            await writer.drain()
+        writer.close()
+
+
+class TestAsyncFtpClient(unittest.IsolatedAsyncioTestCase):
+    """
+    This class contains unit tests for the `AsyncFtpClient` class.
+    """
+
+    async def asyncSetUp(self):
+        self.server = FakeFtpServer({
+            '/dir/a.txt': b'a' * 1000,
+            '/dir/b.txt': b'b' * 300000,
+            '/dir/sub/c.txt': b'c',
+        })
+        self.port = await self.server.start()
+        self.client = AsyncFtpClient(block_size=4096)
+        self.assertTrue(await self.client.login('127.0.0.1', 'user', 'password', self.port))
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop()
+
+    async def test_login_invalid_password(self):
+        client = AsyncFtpClient()
+        self.assertFalse(await client.login('127.0.0.1', 'user', 'wrong', self.port))
+        self.assertFalse(client.connection.connected)
+
+    async def test_entries_list_fallback(self):
+        entries = await self.client.entries('/dir')
+        self.assertEqual([(entry.name, entry.type, entry.size) for entry in entries],
+                         [('sub', 'dir', 0), ('a.txt', 'file', 1000), ('b.txt', 'file', 300000)])
+        self.assertFalse(self.client._mlsd_supported)
+
+    async def test_entries_long_line(self):
+        name = 'x' * 70000
+        self.server.files['/long/' + name] = b'data'
+        self.server.directories.add('/long')
+        entries = await self.client.entries('/long')
+        self.assertEqual([(entry.name, entry.size) for entry in entries], [(name, 4)])
+        self.assertTrue(self.client.connection.connected)
+
+    async def test_download_file_missing(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            self.assertFalse(await self.client.download_file(
+                '/dir/missing.txt', os.path.join(local_dir, 'missing.txt')))
+        self.assertTrue(self.client.connection.connected)
+
+    async def test_download_directory(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            self.assertTrue(await self.client.download_directory('/dir', local_dir, workers=2))
+            for path, data in self.server.files.items():
+                with open(os.path.join(local_dir, os.path.relpath(path, '/dir')), 'rb') as file:
+                    self.assertEqual(file.read(), data)
+        self.assertEqual(self.server.sessions, 3)
+
+    async def test_upload_directory(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            os.makedirs(os.path.join(local_dir, 'sub'))
+            for name, data in (('x.txt', b'x' * 70000), ('sub/y.txt', b'y')):
+                with open(os.path.join(local_dir, name), 'wb') as file:
+                    file.write(data)
+            self.assertTrue(await self.client.upload_directory(local_dir, '/up', workers=4))
+        self.assertEqual(self.server.files['/up/x.txt'], b'x' * 70000)
+        self.assertEqual(self.server.files['/up/sub/y.txt'], b'y')
+        self.assertIn('/up/sub', self.server.directories)
+
+
+if __name__ == '__main__':
+    unittest.main()
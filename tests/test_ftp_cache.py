@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import patch
+
+from ftp_client.cache import ListingCache
+from ftp_client.listing import FtpEntry
+
+
+class TestListingCache(unittest.TestCase):
+    """
+    This class contains unit tests for the `ListingCache` class.
+    """
+
+    def setUp(self):
+        self.cache = ListingCache(ttl=10, max_size=2)
+        self.entries = [FtpEntry('a.txt', 'file', 1)]
+
+    def test_normalize(self):
+        self.assertEqual(ListingCache.normalize('dir/'), 'dir')
+        self.assertEqual(ListingCache.normalize('./dir//sub/'), 'dir/sub')
+        self.assertEqual(ListingCache.normalize('//dir'), '/dir')
+        self.assertEqual(ListingCache.normalize(''), '.')
+
+    def test_get_normalized_path(self):
+        self.cache.put('/dir/', self.entries)
+        self.assertEqual(self.cache.get('/dir'), self.entries)
+        self.assertIsNone(self.cache.get('/other'))
+
+    def test_expired(self):
+        with patch('ftp_client.cache.time.monotonic', return_value=100):
+            self.cache.put('/dir', self.entries)
+        with patch('ftp_client.cache.time.monotonic', return_value=110):
+            self.assertIsNone(self.cache.get('/dir'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_is_dropped(self):
+        self.cache.put('/a', self.entries)
+        self.cache.put('/b', self.entries)
+        self.cache.get('/a')
+        self.cache.put('/c', self.entries)
+        self.assertIsNotNone(self.cache.get('/a'))
+        self.assertIsNone(self.cache.get('/b'))
+
+    def test_invalidate(self):
+        cache = ListingCache()
+        for path in ('/dir', '/dir/sub', '/dir/sub/deep', '/dir/subway', '/other'):
+            cache.put(path, self.entries)
+        cache.invalidate('/dir/sub/')
+        self.assertIsNone(cache.get('/dir'))
+        self.assertIsNone(cache.get('/dir/sub'))
+        self.assertIsNone(cache.get('/dir/sub/deep'))
+        self.assertIsNotNone(cache.get('/dir/subway'))
+        self.assertIsNotNone(cache.get('/other'))
+
+    def test_disabled(self):
+        cache = ListingCache(ttl=0)
+        cache.put('/dir', self.entries)
+        self.assertIsNone(cache.get('/dir'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,16 @@
+import asyncio
 import os
+import tempfile
 import unittest
+import zlib
 from unittest.mock import patch, MagicMock, Mock, call
 
 from dotenv import find_dotenv, load_dotenv
 
 from ftp_client.connect import Connection
 from ftp_client.ftpclient import FtpClient
+from ftp_client.listing import FtpEntry
+from ftp_client.transfer import DeflateConnection
 
 
 class TestFtpClient(unittest.TestCase):
@@ -278,8 +283,10 @@ class TestFtpClient(unittest.TestCase):
         self.client.connection.connected = True
         self.client.logged_in = True
         self.client.connection.create_pasv_con.return_value = MagicMock()
-        self.client.connection.get_response.return_value = '226 Transfer complete.\r\n'
-        self.client.connection.create_pasv_con().recv.return_value = b'file1.txt\r\nfile2.txt\r\n'
+        self.client.connection.get_response.side_effect = [
+            {'code': '150', 'error': False}, {'code': '226', 'error': False}]
+        self.client.connection.create_pasv_con().recv.side_effect = [
+            b'file1.txt\r\nfile2.txt\r\n', b'']
 
         result = self.client.nlist()
         self.assertEqual(result, ['file1.txt', 'file2.txt'])
@@ -291,8 +298,10 @@ class TestFtpClient(unittest.TestCase):
         self.client.connection.connected = True
         self.client.logged_in = True
         self.client.connection.create_pasv_con.return_value = MagicMock()
-        self.client.connection.get_response.return_value = '226 Transfer complete.\r\n'
-        self.client.connection.create_pasv_con().recv.return_value = b'file1.txt\r\nfile2.txt\r\n'
+        self.client.connection.get_response.side_effect = [
+            {'code': '150', 'error': False}, {'code': '226', 'error': False}]
+        self.client.connection.create_pasv_con().recv.side_effect = [
+            b'file1.txt\r\nfile2.txt\r\n', b'']
 
         result = self.client.list()
         self.assertEqual(result, ['file1.txt', 'file2.txt'])
@@ -387,6 +396,658 @@ class TestFtpClient(unittest.TestCase):
         self.assertEqual(cm.exception.code, None)
         mock_print.assert_called_once_with("You are not currently connected to a server.")
 
+    def test_make_directories(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.make_directories(['a', 'a/b'])
+        self.client.connection.send_pipelined.assert_called_once_with(['MKD a', 'MKD a/b'])
+
+    def test_stat_files(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.connection.send_pipelined.return_value = [
+            {'code': '213', 'message': '1234'},
+            {'code': '213', 'message': '20230501100000'},
+            {'code': '550', 'message': 'No such file.'},
+            {'code': '550', 'message': 'No such file.'},
+        ]
+        result = self.client.stat_files(['a.txt', 'b.txt'])
+        self.client.connection.send_pipelined.assert_called_once_with(
+            ['SIZE a.txt', 'MDTM a.txt', 'SIZE b.txt', 'MDTM b.txt'])
+        self.assertEqual(result['a.txt'], {'size': 1234, 'modify': 1682935200})
+        self.assertEqual(result['b.txt'], {'size': None, 'modify': None})
+
+    def test_download_directory_parallel(self):
+        listings = {
+            '/remote': [FtpEntry('a.txt', 'file', 1), FtpEntry('sub', 'dir')],
+            '/remote/sub': [FtpEntry('b.txt', 'file', 2), FtpEntry('c.txt', 'file', 3)],
+        }
+        self.client.entries = MagicMock(side_effect=lambda path: listings[path])
+        sessions = [MagicMock(), MagicMock()]
+        for session in sessions:
+            session.download_file.return_value = True
+        pool = MagicMock()
+        pool.acquire.side_effect = sessions
+        self.client.session_pool = MagicMock(return_value=pool)
+        with tempfile.TemporaryDirectory() as local_dir:
+            result = asyncio.run(self.client.download_directory_parallel('/remote', local_dir, 2))
+            self.assertTrue(os.path.isdir(os.path.join(local_dir, 'sub')))
+        self.assertTrue(result)
+        downloaded = sorted(args[0] for session in sessions
+                            for args, _ in session.download_file.call_args_list)
+        self.assertEqual(downloaded, ['/remote/a.txt', '/remote/sub/b.txt', '/remote/sub/c.txt'])
+        self.assertEqual(pool.release.call_count, 2)
+
+    def test_download_directory_parallel_reports_failures(self):
+        self.client.entries = MagicMock(return_value=[FtpEntry('a.txt', 'file', 1)])
+        session = MagicMock()
+        session.download_file.return_value = False
+        pool = MagicMock()
+        pool.acquire.side_effect = [session, None]
+        self.client.session_pool = MagicMock(return_value=pool)
+        with tempfile.TemporaryDirectory() as local_dir:
+            self.assertFalse(
+                asyncio.run(self.client.download_directory_parallel('/remote', local_dir, 2)))
+
+    def test_upload_directory_parallel(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        sessions = [MagicMock(), MagicMock()]
+        for session in sessions:
+            session.upload_file.return_value = True
+        pool = MagicMock()
+        pool.acquire.side_effect = sessions
+        self.client.session_pool = MagicMock(return_value=pool)
+        with tempfile.TemporaryDirectory() as local_dir:
+            os.makedirs(os.path.join(local_dir, 'sub'))
+            for name in ['a.txt', 'b.txt', os.path.join('sub', 'c.txt')]:
+                with open(os.path.join(local_dir, name), 'w') as file:
+                    file.write(name)
+            self.client.upload_directory(local_dir, 'remote', workers=2)
+        self.client.connection.send_pipelined.assert_called_once_with(['MKD remote',
+                                                                       'MKD remote/sub'])
+        uploaded = sorted(args[1] for session in sessions
+                          for args, _ in session.upload_file.call_args_list)
+        self.assertEqual(uploaded, ['remote/a.txt', 'remote/b.txt', 'remote/sub/c.txt'])
+        self.assertEqual(pool.release.call_count, 2)
+
+    def _prepare_download(self, data, final_response):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        data_con = MagicMock()
+        chunks = [data, b'']
+
+        def recv_into(view, size=0):
+            chunk = chunks.pop(0)
+            view[:len(chunk)] = chunk
+            return len(chunk)
+
+        data_con.recv_into.side_effect = recv_into
+        self.client.connection.create_pasv_con.return_value = data_con
+        self.client.connection.get_response.side_effect = [
+            {'code': '150', 'error': False}, final_response]
+
+    def test_download_file_known_size(self):
+        self._prepare_download(b'abc', {'code': '226', 'error': False})
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, 'file')
+            self.assertTrue(self.client.download_file('file', local_file, 3))
+            with open(local_file, 'rb') as file:
+                self.assertEqual(file.read(), b'abc')
+
+    def test_download_file_failed_keeps_only_received_data(self):
+        self._prepare_download(b'abc', {'code': '426', 'error': True})
+        data_con = self.client.connection.create_pasv_con.return_value
+        recv_into = data_con.recv_into.side_effect
+
+        def fail_after_first_chunk(view, size=0):
+            if data_con.recv_into.call_count > 1:
+                raise ConnectionResetError()
+            return recv_into(view, size)
+
+        data_con.recv_into.side_effect = fail_after_first_chunk
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, 'file')
+            self.assertFalse(self.client.download_file('file', local_file, 1000))
+            self.assertEqual(os.path.getsize(local_file), 3)
+
+    def test_download_file_aborted_transfer(self):
+        self._prepare_download(b'ab', {'code': '426', 'error': True})
+        with tempfile.TemporaryDirectory() as local_dir:
+            self.assertFalse(
+                self.client.download_file('file', os.path.join(local_dir, 'file'), 3))
+
+    def test_download_passes_listed_size(self):
+        self.client._check_connection = MagicMock(return_value=True)
+        self.client._check_logged_in = MagicMock(return_value=True)
+        self.client.list = MagicMock(
+            return_value=['-rw-r--r--  1 user group      1234 May 20 15:43 file.txt'])
+        self.client.download_file = MagicMock()
+        self.client.download('/remote/file.txt', '/local')
+        self.client.download_file.assert_called_once_with(
+            '/remote/file.txt', os.path.join('/local', 'file.txt'), 1234, False, 1)
+
+    def test_upload_files_parallel_session_exits(self):
+        session = MagicMock()
+        session.upload_file.side_effect = SystemExit()
+        pool = MagicMock()
+        pool.acquire.side_effect = [session, None]
+        self.client.session_pool = MagicMock(return_value=pool)
+        result = self.client._upload_files_parallel([('a.txt', 'remote/a.txt')], 1)
+        self.assertFalse(result)
+        pool.release.assert_called_once_with(session, discard=True)
+
+    def test_upload_reports_failed_directory(self):
+        self.client._check_connection = MagicMock(return_value=True)
+        self.client._check_logged_in = MagicMock(return_value=True)
+        self.client.upload_directory = MagicMock(return_value=False)
+        with tempfile.TemporaryDirectory() as local_dir, \
+                patch('builtins.print') as mock_print:
+            self.assertFalse(self.client.upload(local_dir, 'remote'))
+        mock_print.assert_called_with('Upload finished with errors.')
+
+    def test_download_directory_parallel_session_exits(self):
+        self.client.entries = MagicMock(return_value=[FtpEntry('a.txt', 'file', 1)])
+        session = MagicMock()
+        session.download_file.side_effect = SystemExit()
+        pool = MagicMock()
+        pool.acquire.side_effect = [session, None]
+        self.client.session_pool = MagicMock(return_value=pool)
+        with tempfile.TemporaryDirectory() as local_dir:
+            self.assertFalse(
+                asyncio.run(self.client.download_directory_parallel('/remote', local_dir, 1)))
+        pool.release.assert_called_once_with(session, discard=True)
+
+    def test_download_file_resume(self):
+        self._prepare_download(b'def', {'code': '226', 'error': False})
+        self.client.connection.get_response.side_effect = [
+            {'code': '350', 'error': False}, {'code': '150', 'error': False},
+            {'code': '226', 'error': False}]
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, 'file')
+            with open(local_file, 'wb') as file:
+                file.write(b'abc')
+            self.assertTrue(self.client.download_file('file', local_file, 6, resume=True))
+            with open(local_file, 'rb') as file:
+                self.assertEqual(file.read(), b'abcdef')
+        self.client.connection.send_request.assert_any_call('REST 3')
+
+    def test_download_file_resume_complete(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, 'file')
+            with open(local_file, 'wb') as file:
+                file.write(b'abc')
+            self.assertTrue(self.client.download_file('file', local_file, 3, resume=True))
+        self.client.connection.create_pasv_con.assert_not_called()
+
+    def test_download_file_resume_short(self):
+        self._prepare_download(b'de', {'code': '226', 'error': False})
+        self.client.connection.get_response.side_effect = [
+            {'code': '350', 'error': False}, {'code': '150', 'error': False},
+            {'code': '226', 'error': False}]
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, 'file')
+            with open(local_file, 'wb') as file:
+                file.write(b'abc')
+            self.assertFalse(self.client.download_file('file', local_file, 6, resume=True))
+
+    @staticmethod
+    def _make_range_session(data):
+        """
+        Returns a session whose data connection serves `data` from the last REST offset.
+        """
+        session = FtpClient()
+        session.connection = MagicMock()
+        state = {'offset': 0, 'sent': False, 'request': ''}
+
+        def send_request(request):
+            state['request'] = request
+            if request.startswith('REST'):
+                state['offset'] = int(request[5:])
+
+        def get_response():
+            codes = {'REST': '350', 'RETR': '150', 'ABOR': '226'}
+            return {'code': codes.get(state['request'][:4], '226'), 'error': False}
+
+        def recv_into(view, size=0):
+            chunk = b'' if state['sent'] else data[state['offset']:state['offset'] + size]
+            state['sent'] = True
+            view[:len(chunk)] = chunk
+            return len(chunk)
+
+        session.connection.send_request.side_effect = send_request
+        session.connection.get_response.side_effect = get_response
+        session.connection.create_pasv_con.return_value.recv_into.side_effect = recv_into
+        return session
+
+    def test_download_file_segmented(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.MIN_SEGMENT_SIZE = 4
+        data = b'0123456789'
+        sessions = []
+        pool = MagicMock()
+        pool.acquire.side_effect = lambda: sessions.append(
+            self._make_range_session(data)) or sessions[-1]
+        self.client.session_pool = MagicMock(return_value=pool)
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, 'file')
+            self.assertTrue(self.client.download_file('file', local_file, len(data), segments=2))
+            with open(local_file, 'rb') as file:
+                self.assertEqual(file.read(), data)
+        self.assertEqual(len(sessions), 2)
+        aborted = [session for session in sessions
+                   if call('ABOR') in session.connection.send_request.call_args_list]
+        self.assertEqual(len(aborted), 1)
+
+    def test_download_file_segmented_failure_removes_part(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.MIN_SEGMENT_SIZE = 4
+        pool = MagicMock()
+        pool.acquire.return_value = None
+        self.client.session_pool = MagicMock(return_value=pool)
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, 'file')
+            self.assertFalse(self.client.download_file('file', local_file, 10, segments=2))
+            self.assertEqual(os.listdir(local_dir), [])
+
+    def test_download_file_resume_skips_segments(self):
+        self._prepare_download(b'def', {'code': '226', 'error': False})
+        self.client.connection.get_response.side_effect = [
+            {'code': '350', 'error': False}, {'code': '150', 'error': False},
+            {'code': '226', 'error': False}]
+        self.client.MIN_SEGMENT_SIZE = 1
+        self.client._download_segmented = MagicMock()
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, 'file')
+            with open(local_file, 'wb') as file:
+                file.write(b'abc')
+            self.assertTrue(self.client.download_file('file', local_file, 6, resume=True,
+                                                      segments=4))
+            with open(local_file, 'rb') as file:
+                self.assertEqual(file.read(), b'abcdef')
+        self.client._download_segmented.assert_not_called()
+
+    def _prepare_resumed_upload(self, local_dir, remote_size, crc_response):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        local_file = os.path.join(local_dir, 'log.txt')
+        with open(local_file, 'wb') as file:
+            file.write(b'old lines\nnew lines\n')
+        self.client.size = MagicMock(return_value=remote_size)
+        self.client.connection.get_response.side_effect = [
+            crc_response, {'code': '350', 'error': False}, {'code': '150', 'error': False},
+            {'code': '226', 'error': False}]
+        return local_file
+
+    def test_upload_file_resume(self):
+        crc = format(zlib.crc32(b'old lines\n'), 'X')
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = self._prepare_resumed_upload(
+                local_dir, 10, {'code': '250', 'message': crc, 'error': False})
+            with patch('ftp_client.ftpclient.send_file') as mock_send_file:
+                self.assertTrue(self.client.upload_file(local_file, 'log.txt', make_dirs=False,
+                                                        resume=True))
+        self.assertEqual(mock_send_file.call_args[0][2], 10)
+        self.client.connection.send_request.assert_any_call('REST 10')
+        self.client.connection.send_request.assert_any_call('STOR log.txt')
+
+    def test_upload_file_resume_prefix_mismatch(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = self._prepare_resumed_upload(
+                local_dir, 10, {'code': '250', 'message': '0', 'error': False})
+            self.client.connection.get_response.side_effect = [
+                {'code': '250', 'message': '0', 'error': False},
+                {'code': '150', 'error': False}, {'code': '226', 'error': False}]
+            with patch('ftp_client.ftpclient.send_file') as mock_send_file:
+                self.assertTrue(self.client.upload_file(local_file, 'log.txt', make_dirs=False,
+                                                        resume=True))
+        self.assertEqual(mock_send_file.call_args[0][2], 0)
+
+    def test_upload_file_resume_complete(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = self._prepare_resumed_upload(
+                local_dir, 20, {'code': '500', 'message': 'Unknown command.', 'error': True})
+            self.assertTrue(self.client.upload_file(local_file, 'log.txt', make_dirs=False,
+                                                    resume=True))
+        self.client.connection.create_pasv_con.assert_not_called()
+
+    def test_entries_mlsd(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.connection.get_response.side_effect = [
+            {'code': '150', 'error': False}, {'code': '226', 'error': False}]
+        self.client.connection.create_pasv_con.return_value.recv.side_effect = [
+            b'type=cdir;modify=20230501100000; .\r\n'
+            b'type=file;size=12;modify=20230501100000;unique=1A; my file.txt\r\n', b'']
+        entries = self.client.entries('/dir')
+        self.client.connection.send_request.assert_called_with('MLSD /dir')
+        self.assertEqual(entries, [FtpEntry('my file.txt', 'file', 12, 1682935200, '1A')])
+
+    def test_entries_list_fallback(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.connection.get_response.return_value = {'code': '500', 'error': True}
+        self.client.iter_list = MagicMock(side_effect=lambda directory: iter([
+            'total 8', '-rw-r--r--  1 user group  1234 May 20  2022 name with spaces.txt']))
+        self.assertEqual([entry.name for entry in self.client.entries('/dir')],
+                         ['name with spaces.txt'])
+        self.assertEqual([entry.name for entry in self.client.entries('/dir')],
+                         ['name with spaces.txt'])
+        self.assertEqual(self.client.connection.create_pasv_con.call_count, 1)
+
+    def test_iter_list_streams_split_lines(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        pasv_con = self.client.connection.create_pasv_con.return_value
+        self.client.connection.get_response.side_effect = [
+            {'code': '150', 'error': False}, {'code': '226', 'error': False}]
+        pasv_con.recv.side_effect = [b'first\r\nsec', b'ond\r', b'\nthird', b'']
+        lines = self.client.iter_list('/dir')
+        self.assertEqual(next(lines), 'first')
+        pasv_con.close.assert_not_called()
+        self.assertEqual(list(lines), ['second', 'third'])
+        pasv_con.close.assert_called_once()
+        self.assertEqual(self.client.connection.get_response.call_count, 2)
+
+    def test_iter_list_refused(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        pasv_con = self.client.connection.create_pasv_con.return_value
+        self.client.connection.get_response.return_value = {'code': '550', 'error': True}
+        self.assertEqual(list(self.client.iter_list('/missing')), [])
+        pasv_con.recv.assert_not_called()
+        pasv_con.close.assert_called_once()
+
+    def test_entries_cached_until_invalidated(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.iter_entries = MagicMock(side_effect=lambda directory: iter(
+            [FtpEntry('a.txt', 'file', 1)]))
+        self.client.connection.get_response.return_value = {'code': '257', 'error': False}
+        self.client.entries('/dir')
+        self.assertEqual(self.client.entries('/dir/'), [FtpEntry('a.txt', 'file', 1)])
+        self.assertEqual(self.client.iter_entries.call_count, 1)
+        self.client.make_directory('/dir/new')
+        self.client.entries('/dir')
+        self.assertEqual(self.client.iter_entries.call_count, 2)
+
+    def test_delete_file(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.listing_cache.put('/dir', [FtpEntry('a.txt', 'file', 1)])
+        self.client.connection.get_response.return_value = {'code': '250', 'error': False}
+        self.assertTrue(self.client.delete_file('/dir/a.txt'))
+        self.client.connection.send_request.assert_called_with('DELE /dir/a.txt')
+        self.assertIsNone(self.client.listing_cache.get('/dir'))
+
+    def test_download_seeds_listing_cache(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.list = MagicMock(return_value=[
+            '-rw-r--r--  1 user group  1 May 20  2022 a.txt',
+            'drwxr-xr-x  2 user group  0 May 20  2022 sub'])
+        self.client._download_directory = MagicMock()
+        self.client.download('/dir', 'local')
+        self.assertEqual([entry.name for entry in self.client.listing_cache.get('/dir')],
+                         ['a.txt', 'sub'])
+
+    def _prepare_sync(self, local_dir, remote_listings):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.entries = MagicMock(side_effect=lambda path: remote_listings.get(path, []))
+        self.client.stat_files = MagicMock(return_value={})
+        self.client.make_directories = MagicMock()
+        os.makedirs(os.path.join(local_dir, 'sub'))
+        for name, content in (('same.txt', b'12345'), ('sub/new.txt', b'new')):
+            with open(os.path.join(local_dir, name), 'wb') as file:
+                file.write(content)
+        os.utime(os.path.join(local_dir, 'same.txt'), (1000, 1000))
+
+    def test_sync_upload_changed_only(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            self._prepare_sync(local_dir, {
+                '/backup': [FtpEntry('same.txt', 'file', 5, 1000), FtpEntry('old', 'dir'),
+                            FtpEntry('sub', 'dir')],
+                '/backup/old': [FtpEntry('gone.txt', 'file', 1, 1000)]})
+            self.client.upload_file = MagicMock(return_value=True)
+            self.client.delete_file = MagicMock(return_value=True)
+            self.client.remove_directory = MagicMock(return_value=True)
+            self.assertTrue(self.client.sync(local_dir, '/backup/', delete=True))
+            self.client.upload_file.assert_called_once_with(
+                os.path.join(local_dir, 'sub/new.txt'), '/backup/sub/new.txt', make_dirs=False)
+            self.client.delete_file.assert_called_once_with('/backup/old/gone.txt')
+            self.client.remove_directory.assert_called_once_with('/backup/old')
+            self.client.stat_files.assert_not_called()
+
+    def test_sync_download_sets_modification_time(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            self._prepare_sync(local_dir, {'/backup': [FtpEntry('same.txt', 'file', 5, 1000),
+                                                       FtpEntry('fresh.txt', 'file', None)]})
+            self.client.stat_files.return_value = {
+                '/backup/fresh.txt': {'size': 2, 'modify': 2000}}
+
+            def download_file(remote_file, local_file, size):
+                with open(local_file, 'wb') as file:
+                    file.write(b'ab')
+                return True
+            self.client.download_file = MagicMock(side_effect=download_file)
+            self.assertTrue(self.client.sync(local_dir, '/backup', download=True, delete=True))
+            self.client.download_file.assert_called_once_with(
+                '/backup/fresh.txt', os.path.join(local_dir, 'fresh.txt'), 2)
+            self.assertEqual(os.path.getmtime(os.path.join(local_dir, 'fresh.txt')), 2000)
+            self.assertEqual(sorted(os.listdir(local_dir)), ['fresh.txt', 'same.txt'])
+
+    def test_sync_download_refuses_to_delete_everything(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            self._prepare_sync(local_dir, {})
+            self.assertFalse(self.client.sync(local_dir, '/missing', download=True, delete=True))
+            self.assertTrue(os.path.isfile(os.path.join(local_dir, 'same.txt')))
+
+    def test_sync_download_keeps_skipped_entries(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            self._prepare_sync(local_dir, {'/backup': [FtpEntry('same.txt', 'link', 5, 1000),
+                                                       FtpEntry('sub', 'link')]})
+            self.client.download_file = MagicMock()
+            self.assertTrue(self.client.sync(local_dir, '/backup', download=True, delete=True))
+            self.client.download_file.assert_not_called()
+            self.assertTrue(os.path.isfile(os.path.join(local_dir, 'same.txt')))
+            self.assertTrue(os.path.isfile(os.path.join(local_dir, 'sub', 'new.txt')))
+
+    def test_sync_download_file_in_place_of_directory(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            self._prepare_sync(local_dir, {'/backup': [FtpEntry('same.txt', 'dir')],
+                                           '/backup/same.txt': [FtpEntry('a.txt', 'file', 1)]})
+
+            def download_file(remote_file, local_file, size):
+                with open(local_file, 'wb') as file:
+                    file.write(b'a')
+                return True
+            self.client.download_file = MagicMock(side_effect=download_file)
+            self.assertFalse(self.client.sync(local_dir, '/backup', download=True))
+            self.client.download_file.assert_not_called()
+            self.assertTrue(self.client.sync(local_dir, '/backup', download=True, delete=True))
+            self.assertTrue(os.path.isfile(os.path.join(local_dir, 'same.txt', 'a.txt')))
+
+    def test_enable_compression(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.connection.send_pipelined.return_value = [
+            {'code': '200', 'error': False}, {'code': '200', 'error': False}]
+        self.assertTrue(self.client.enable_compression(9))
+        self.client.connection.send_pipelined.assert_called_once_with(
+            ['MODE Z', 'OPTS MODE Z LEVEL 9'])
+        self.assertIsInstance(self.client._create_data_con(), DeflateConnection)
+        self.assertEqual(self.client._new_session().compression_level, 9)
+
+    def test_enable_compression_unsupported(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.connection.send_pipelined.return_value = [
+            {'code': '504', 'error': True}, {'code': '501', 'error': True}]
+        self.assertFalse(self.client.enable_compression())
+        self.assertIs(self.client._create_data_con(),
+                      self.client.connection.create_pasv_con.return_value)
+
+    def test_negotiate_features(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.host = 'features.example.com'
+        self.addCleanup(FtpClient._host_features.pop, 'features.example.com', None)
+        self.client.connection.get_response.return_value = {
+            'code': '211', 'error': False,
+            'lines': ['211-Features:', ' MLST type*;size*;modify*;', ' EPSV', ' SIZE',
+                      ' MODE Z', '211 End']}
+        features = self.client.negotiate_features()
+        self.assertEqual(features, {'MLST': 'type*;size*;modify*;', 'EPSV': '', 'SIZE': '',
+                                    'MODE Z': ''})
+        self.assertTrue(self.client._mlsd_supported)
+        self.assertTrue(self.client.connection.use_epsv)
+
+        other = FtpClient()
+        other.connection = MagicMock()
+        other.host = 'features.example.com'
+        self.assertEqual(other.negotiate_features(), features)
+        other.connection.send_request.assert_not_called()
+
+    def test_features_select_commands(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.features = {'SIZE': ''}
+        self.client.connection.send_pipelined.return_value = [
+            {'code': '213', 'message': '12', 'error': False}]
+        self.assertEqual(self.client.stat_files(['a.txt']),
+                         {'a.txt': {'size': 12, 'modify': None}})
+        self.client.connection.send_pipelined.assert_called_once_with(['SIZE a.txt'])
+        self.assertFalse(self.client.enable_compression())
+        self.assertEqual(self.client.connection.send_pipelined.call_count, 1)
+
+    def test_entries_stat_listing(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client._mlsd_supported = False
+        self.client.connection.get_response.return_value = {
+            'code': '213', 'error': False,
+            'lines': ['213-Status of /dir:', ' total 8',
+                      ' drwxr-xr-x  2 user group  4096 May 20  2022 .',
+                      ' -rw-r--r--  1 user group  1234 May 20  2022 a b.txt', '213 End']}
+        self.assertEqual([entry.name for entry in self.client.entries('/dir')], ['a b.txt'])
+        self.client.connection.send_request.assert_called_once_with('STAT /dir')
+        self.client.connection.create_pasv_con.assert_not_called()
+
+    def test_entries_stat_listing_too_large(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client._mlsd_supported = False
+        self.client.STAT_MAX_LINES = 1
+        self.client.connection.get_response.return_value = {
+            'code': '213', 'error': False,
+            'lines': ['213-Status of /dir:', ' total 8',
+                      ' -rw-r--r--  1 user group  1234 May 20  2022 a.txt', '213 End']}
+        self.client.iter_entries = MagicMock(return_value=iter([FtpEntry('a.txt', 'file', 1)]))
+        self.assertEqual(self.client.entries('/dir'), [FtpEntry('a.txt', 'file', 1)])
+        self.client.connection.get_response.assert_called_once_with(max_lines=1)
+        self.client.listing_cache.clear()
+        self.client.entries('/dir/')
+        self.client.connection.send_request.assert_called_once_with('STAT /dir')
+        self.assertEqual(self.client.iter_entries.call_count, 2)
+
+    def test_stat_list_unsupported(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.connection.get_response.return_value = {'code': '502', 'error': True}
+        self.assertIsNone(self.client.stat_list())
+        self.client.connection.send_request.assert_called_once_with('STAT .')
+        self.assertIsNone(self.client.stat_list('/dir'))
+        self.assertEqual(self.client.connection.send_request.call_count, 1)
+
+    def test_download_uses_mlst(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client._mlsd_supported = True
+        self.client.mlst = MagicMock(return_value=FtpEntry('/dir/a.txt', 'file', 42))
+        self.client.list = MagicMock()
+        self.client.download_file = MagicMock(return_value=True)
+        self.client.download('/dir/a.txt', 'local')
+        self.client.list.assert_not_called()
+        self.client.download_file.assert_called_once_with(
+            '/dir/a.txt', os.path.join('local', 'a.txt'), 42, False, 1)
+
+    def _prepare_fxp(self, source_replies, target_replies):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.host = 'source.com'
+        target = FtpClient()
+        target.connection = MagicMock()
+        target.connection.connected = True
+        target.logged_in = True
+        target.host = 'target.com'
+        self.client.connection.get_response.side_effect = source_replies
+        target.connection.get_response.side_effect = target_replies
+        return target
+
+    def test_fxp_file(self):
+        target = self._prepare_fxp(
+            [{'code': '227', 'message': 'Entering Passive Mode (192,0,2,1,4,1).', 'error': False},
+             {'code': '150', 'error': False}, {'code': '226', 'error': False}],
+            [{'code': '200', 'error': False}, {'code': '150', 'error': False},
+             {'code': '226', 'error': False}])
+        self.assertTrue(self.client.fxp_file(target, '/a.txt', '/copy/a.txt'))
+        target.connection.send_request.assert_any_call('PORT 192,0,2,1,4,1')
+        target.connection.send_request.assert_called_with('STOR /copy/a.txt')
+        self.client.connection.send_request.assert_called_with('RETR /a.txt')
+        self.client.connection.create_pasv_con.assert_not_called()
+
+    def test_fxp_file_missing_source(self):
+        target = self._prepare_fxp(
+            [{'code': '227', 'message': 'Entering Passive Mode (192,0,2,1,4,1).', 'error': False},
+             {'code': '550', 'error': True}],
+            [{'code': '200', 'error': False}, {'code': '150', 'error': False},
+             {'code': '426', 'error': True}, {'code': '226', 'error': False},
+             {'code': '250', 'error': False}])
+        self.assertFalse(self.client.fxp_file(target, '/missing.txt', '/copy/missing.txt'))
+        self.assertEqual(target.connection.send_request.call_args_list[-2:],
+                         [call('ABOR'), call('DELE /copy/missing.txt')])
+
+    def test_fxp_file_timeout_is_not_fatal(self):
+        target = self._prepare_fxp(
+            [{'code': '227', 'message': 'Entering Passive Mode (192,0,2,1,4,1).', 'error': False},
+             {'code': '150', 'error': False}, False],
+            [{'code': '200', 'error': False}, {'code': '150', 'error': False},
+             {'code': '426', 'error': True}, {'code': '226', 'error': False},
+             {'code': '250', 'error': False}])
+        self.assertFalse(self.client.fxp_file(target, '/a.txt', '/copy/a.txt'))
+        self.assertEqual(self.client.connection.get_response.call_args,
+                         call(exit_on_timeout=False))
+        self.assertEqual(target.connection.send_request.call_args_list[-2:],
+                         [call('ABOR'), call('DELE /copy/a.txt')])
+
+    def test_fxp_single_file_without_size(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.host = 'source.com'
+        self.client.features = {'MDTM': ''}
+        self.client.size = MagicMock(return_value=None)
+        self.client.entries = MagicMock(return_value=[FtpEntry('a.txt', 'file', 3),
+                                                      FtpEntry('sub', 'dir')])
+        self.client.fxp_file = MagicMock(return_value=True)
+        target = MagicMock(host='target.com')
+        self.assertTrue(self.client.fxp(target, '/dir/a.txt', '/copy/a.txt'))
+        self.client.entries.assert_called_once_with('/dir')
+        self.client.fxp_file.assert_called_once_with(target, '/dir/a.txt', '/copy/a.txt')
+        self.assertFalse(self.client.fxp(target, '/dir/missing.txt', '/copy/missing.txt'))
+
+    def test_mlst(self):
+        self.client.connection.connected = True
+        self.client.logged_in = True
+        self.client.connection.get_response.return_value = {
+            'code': '250', 'error': False,
+            'lines': ['250-Listing /dir/a b', ' type=file;size=5; /dir/a b', '250 End']}
+        self.assertEqual(self.client.mlst('/dir/a b'), FtpEntry('/dir/a b', 'file', 5))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,10 +1,12 @@
 import os
 import unittest
 import socket
+from unittest.mock import MagicMock, patch
 
 from dotenv import load_dotenv, find_dotenv
 
-from ftp_client.connect import Connection
+from ftp_client import connect
+from ftp_client.connect import Connection, ReplyFramer, connect_fastest, resolve
 
 
 class TestFTPConnection(unittest.TestCase):
@@ -87,6 +89,171 @@ class TestFTPConnection(unittest.TestCase):
         self.assertIsInstance(file_con, socket.socket)
         self.conn.close()
 
+    def test_get_response_multi_line(self):
+        """
+        Tests that `get_response` returns a multi-line reply as a single response.
+        """
+        self.conn.server = MagicMock()
+        self.conn.server.recv.side_effect = [
+            b'211-Features:\r\n MDTM\r\n SIZE\r\n211 End\r\n', b'']
+        response = self.conn.get_response()
+        self.assertEqual(response['code'], '211')
+        self.assertEqual(response['message'], 'End')
+        self.assertEqual(response['lines'], ['211-Features:', ' MDTM', ' SIZE', '211 End'])
+
+    def test_get_response_split_reply(self):
+        """
+        Tests that `get_response` waits for the rest of a reply split across segments.
+        """
+        self.conn.server = MagicMock()
+        self.conn.server.recv.side_effect = [b'22', b'0 Service re', b'ady\r\n']
+        response = self.conn.get_response()
+        self.assertEqual(response['code'], '220')
+        self.assertEqual(response['message'], 'Service ready')
+
+    def test_get_response_merged_replies(self):
+        """
+        Tests that replies arriving together are returned one at a time.
+        """
+        self.conn.server = MagicMock()
+        self.conn.server.recv.side_effect = [b'331 Password required\r\n230 Logged in\r\n']
+        self.assertEqual(self.conn.get_response()['code'], '331')
+        self.assertEqual(self.conn.get_response()['code'], '230')
+        self.assertEqual(self.conn.server.recv.call_count, 1)
+
+    def test_get_response_connection_closed(self):
+        """
+        Tests that `get_response` returns False if the server closes the connection.
+        """
+        self.conn.server = MagicMock()
+        self.conn.server.recv.return_value = b''
+        self.assertFalse(self.conn.get_response())
+        self.assertFalse(self.conn.connected)
+
+    def test_send_pipelined(self):
+        """
+        Tests that `send_pipelined` sends all requests at once and matches replies in order.
+        """
+        self.conn.server = MagicMock()
+        self.conn.server.recv.side_effect = [b'257 "a" created\r\n550 Exists\r\n',
+                                             b'257 "a/b" created\r\n']
+        responses = self.conn.send_pipelined(['MKD a', 'MKD a', 'MKD a/b'])
+        self.conn.server.sendall.assert_called_once_with(b'MKD a\r\nMKD a\r\nMKD a/b\r\n')
+        self.assertEqual([response['code'] for response in responses], ['257', '550', '257'])
+
+    def test_send_pipelined_connection_closed(self):
+        """
+        Tests that unanswered pipelined requests get False once the server closes the connection.
+        """
+        self.conn.server = MagicMock()
+        self.conn.server.recv.side_effect = [b'200 OK\r\n', b'']
+        responses = self.conn.send_pipelined(['NOOP', 'NOOP', 'NOOP'])
+        self.assertEqual(responses[0]['code'], '200')
+        self.assertEqual(responses[1:], [False, False])
+
+    def test_is_alive(self):
+        """
+        Tests that `is_alive` reports whether the server answers NOOP without exiting.
+        """
+        self.conn.server = MagicMock()
+        self.conn.connected = True
+        self.conn.server.recv.return_value = b'200 NOOP ok.\r\n'
+        self.assertTrue(self.conn.is_alive())
+        self.conn.server.sendall.assert_called_with(b'NOOP\r\n')
+        self.conn.server.gettimeout.return_value = 20
+        self.conn.server.recv.side_effect = socket.timeout()
+        self.assertFalse(self.conn.is_alive())
+        self.conn.server.settimeout.assert_called_with(20)
+
+    def test_get_response_max_lines(self):
+        """
+        Tests that `get_response` keeps at most one more than `max_lines` inner lines of a
+        long reply and still consumes all of it.
+        """
+        self.conn.server = MagicMock()
+        self.conn.server.recv.side_effect = [
+            b'213-Status:\r\n a\r\n b\r\n c\r\n d\r\n213 End\r\n200 OK\r\n', b'']
+        response = self.conn.get_response(max_lines=2)
+        self.assertEqual(response['lines'], ['213-Status:', ' a', ' b', ' c', '213 End'])
+        self.assertEqual(self.conn.get_response()['code'], '200')
+
+    def test_reply_framer(self):
+        """
+        Tests that `ReplyFramer` completes single-line replies at once and multi-line replies
+        at the closing line of the same code.
+        """
+        framer = ReplyFramer()
+        self.assertTrue(framer.add('200 OK'))
+        framer = ReplyFramer()
+        for line in ['211-Features:', ' 211 is not the end', '211-Neither is this']:
+            self.assertFalse(framer.add(line))
+        self.assertTrue(framer.add('211 End'))
+        self.assertEqual(len(framer.lines), 4)
+
+    @patch('ftp_client.connect.socket.socket')
+    def test_create_pasv_con_epsv(self, mock_socket):
+        """
+        Tests that `create_pasv_con` connects to the EPSV port on the control connection's host,
+        and falls back to PASV for good once EPSV is refused.
+        """
+        self.conn.server = MagicMock()
+        self.conn.host = '192.0.2.1'
+        self.conn.use_epsv = True
+        self.conn.server.recv.side_effect = [
+            b'229 Entering Extended Passive Mode (|||6446|)\r\n',
+            b'500 EPSV not understood\r\n227 Entering Passive Mode (192,0,2,1,4,1)\r\n']
+        self.assertIs(self.conn.create_pasv_con(), mock_socket.return_value)
+        mock_socket.return_value.connect.assert_called_with(('192.0.2.1', 6446))
+        self.conn.create_pasv_con()
+        mock_socket.return_value.connect.assert_called_with(('192.0.2.1', 1025))
+        self.assertFalse(self.conn.use_epsv)
+
+    @patch('ftp_client.connect.socket.socket')
+    def test_create_pasv_con_ipv6_epsv_refused(self, mock_socket):
+        """
+        Tests that `create_pasv_con` does not fall back to PASV on an IPv6 control connection.
+        """
+        self.conn.server = MagicMock()
+        self.conn.server.family = socket.AF_INET6
+        self.conn.host = '2001:db8::1'
+        self.conn.use_epsv = True
+        self.conn.server.recv.side_effect = [b'500 EPSV not understood\r\n']
+        self.assertFalse(self.conn.create_pasv_con())
+        self.conn.server.sendall.assert_called_once_with(b'EPSV\r\n')
+        mock_socket.assert_not_called()
+
+    @patch('ftp_client.connect.socket.getaddrinfo')
+    def test_resolve_interleaves_and_caches(self, mock_getaddrinfo):
+        """
+        Tests that `resolve` alternates IPv6 and IPv4 addresses and caches the lookup.
+        """
+        self.addCleanup(connect._dns_cache.clear)
+        mock_getaddrinfo.return_value = [
+            (socket.AF_INET6, None, None, '', ('2001:db8::1', 21, 0, 0)),
+            (socket.AF_INET6, None, None, '', ('2001:db8::2', 21, 0, 0)),
+            (socket.AF_INET, None, None, '', ('192.0.2.1', 21)),
+            (socket.AF_INET, None, None, '', ('192.0.2.1', 21))]
+        addresses = resolve('ftp.example.com', 21)
+        self.assertEqual([sockaddr[0] for _, sockaddr in addresses],
+                         ['2001:db8::1', '192.0.2.1', '2001:db8::2'])
+        self.assertEqual(resolve('ftp.example.com', 21), addresses)
+        mock_getaddrinfo.assert_called_once()
+
+    def test_connect_fastest(self):
+        """
+        Tests that `connect_fastest` skips an address that refuses the connection.
+        """
+        with socket.socket() as listener, socket.socket() as closed:
+            listener.bind(('127.0.0.1', 0))
+            listener.listen(1)
+            closed.bind(('127.0.0.1', 0))
+            addresses = [(socket.AF_INET, closed.getsockname()),
+                         (socket.AF_INET, listener.getsockname())]
+            with connect_fastest(addresses, timeout=5, delay=5) as sock:
+                self.assertEqual(sock.getpeername(), listener.getsockname())
+            with self.assertRaises(OSError):
+                connect_fastest(addresses[:1], timeout=5)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,51 @@
+import calendar
+import unittest
+
+from ftp_client.listing import FtpEntry, parse_list_line, parse_mlsx_line, parse_time_val
+
+
+class TestFtpListing(unittest.TestCase):
+    """
+    This class contains unit tests for the FTP Listing module.
+    """
+
+    def test_parse_time_val(self):
+        self.assertEqual(parse_time_val('20230501100000'), 1682935200)
+        self.assertEqual(parse_time_val('20230501100000.5'), 1682935200.5)
+        self.assertIsNone(parse_time_val('garbage'))
+
+    def test_parse_mlsx_line(self):
+        entry = parse_mlsx_line('Type=dir;Modify=20230501100000;UNIQUE=801U1; backups 2023')
+        self.assertEqual(entry, FtpEntry('backups 2023', 'dir', None, 1682935200, '801U1'))
+        self.assertTrue(entry.is_dir)
+
+    def test_parse_mlsx_line_symlink(self):
+        entry = parse_mlsx_line('type=OS.unix=slink:/target;size=6; link')
+        self.assertEqual(entry.type, 'link')
+        self.assertEqual(entry.size, 6)
+
+    def test_parse_mlsx_line_invalid(self):
+        self.assertIsNone(parse_mlsx_line('type=file;size=1;'))
+
+    def test_parse_list_line_unix(self):
+        entry = parse_list_line('-rw-r--r--   1 user  group  1234 May 20  2022 my file.txt')
+        self.assertEqual(entry, FtpEntry('my file.txt', 'file', 1234,
+                                         calendar.timegm((2022, 5, 20, 0, 0, 0, 0, 0, 0))))
+
+    def test_parse_list_line_unix_directory_and_link(self):
+        self.assertTrue(parse_list_line('drwxr-xr-x 2 user group 4096 Jan 1 10:00 dir').is_dir)
+        link = parse_list_line('lrwxrwxrwx 1 user group 6 Jan 1 10:00 a link -> target')
+        self.assertEqual((link.name, link.type), ('a link', 'link'))
+
+    def test_parse_list_line_dos(self):
+        self.assertEqual(parse_list_line('05-01-23  10:00AM       <DIR>          My Dir'),
+                         FtpEntry('My Dir', 'dir', None, 1682935200))
+        self.assertEqual(parse_list_line('05-01-23  01:30PM                 1234 a.txt'),
+                         FtpEntry('a.txt', 'file', 1234, 1682947800))
+
+    def test_parse_list_line_total(self):
+        self.assertIsNone(parse_list_line('total 12'))
+
+
+if __name__ == '__main__':
+    unittest.main()
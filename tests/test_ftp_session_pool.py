@@ -0,0 +1,92 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from ftp_client.session_pool import FtpSessionPool
+
+
+class TestFtpSessionPool(unittest.TestCase):
+    """
+    This class contains unit tests for the `FtpSessionPool` class.
+    """
+
+    def setUp(self):
+        self.sessions = []
+        self.pool = FtpSessionPool('localhost', 'user', 'password', size=2,
+                                   session_factory=self._make_session)
+
+    def _make_session(self):
+        session = MagicMock()
+        session.login.return_value = True
+        session.connection.connected = True
+        session.connection.is_alive.return_value = True
+        self.sessions.append(session)
+        return session
+
+    def test_acquire_logs_in_new_session(self):
+        session = self.pool.acquire()
+        self.assertIs(session, self.sessions[0])
+        session.login.assert_called_once_with('localhost', 'user', 'password')
+
+    def test_release_reuses_session(self):
+        session = self.pool.acquire()
+        self.pool.release(session)
+        self.assertIs(self.pool.acquire(), session)
+        self.assertEqual(len(self.sessions), 1)
+
+    def test_acquire_times_out_when_exhausted(self):
+        self.pool.acquire()
+        self.pool.acquire()
+        self.assertIsNone(self.pool.acquire(timeout=0.01))
+        self.assertEqual(len(self.sessions), 2)
+
+    def test_acquire_waits_for_release(self):
+        first = self.pool.acquire()
+        self.pool.acquire()
+        threading.Timer(0.05, self.pool.release, (first,)).start()
+        self.assertIs(self.pool.acquire(timeout=5), first)
+
+    def test_dead_session_is_replaced(self):
+        self.pool.check_interval = 0
+        session = self.pool.acquire()
+        self.pool.release(session)
+        session.connection.is_alive.return_value = False
+        replacement = self.pool.acquire()
+        self.assertIsNot(replacement, session)
+        session.connection.close.assert_called_once()
+
+    def test_failed_login_frees_slot(self):
+        self.pool._session_factory = MagicMock(return_value=MagicMock(
+            **{'login.return_value': False}))
+        self.assertIsNone(self.pool.acquire())
+        self.assertEqual(self.pool._opened, 0)
+        self.pool._session_factory.return_value.connection.close.assert_called_once()
+
+    def test_login_timeout_closes_connection(self):
+        session = MagicMock(**{'login.side_effect': SystemExit()})
+        self.pool._session_factory = MagicMock(return_value=session)
+        self.assertIsNone(self.pool.acquire())
+        session.connection.close.assert_called_once()
+
+    def test_warm_up(self):
+        self.assertEqual(self.pool.warm_up(), 2)
+        self.assertEqual(len(self.pool._idle), 2)
+        self.assertEqual(self.pool.warm_up(), 0)
+
+    def test_session_context_discards_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.pool.session() as session:
+                raise ValueError()
+        session.connection.close.assert_called_once()
+        self.assertEqual(self.pool._opened, 0)
+
+    def test_close(self):
+        session = self.pool.acquire()
+        self.pool.release(session)
+        self.pool.close()
+        session.connection.send_request.assert_called_with('QUIT')
+        self.assertIsNone(self.pool.acquire())
+
+
+if __name__ == '__main__':
+    unittest.main()
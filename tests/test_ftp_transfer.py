@@ -0,0 +1,100 @@
+import socket
+import tempfile
+import threading
+import unittest
+import zlib
+from unittest.mock import MagicMock
+
+from ftp_client.transfer import DeflateConnection, preallocate, receive_file, send_file
+
+
+class TestFtpTransfer(unittest.TestCase):
+    """
+    This class contains unit tests for the FTP Transfer module.
+    """
+
+    def setUp(self):
+        self.file = tempfile.TemporaryFile()
+        self.data = bytes(range(256)) * 1000
+        self.file.write(self.data)
+        self.file.seek(0)
+
+    def tearDown(self):
+        self.file.close()
+
+    @staticmethod
+    def _receive_all(receiver, received):
+        while True:
+            chunk = receiver.recv(65536)
+            if not chunk:
+                return
+            received += chunk
+
+    def _send_and_close(self, sender):
+        sender.sendall(self.data)
+        sender.close()
+
+    def test_send_file(self):
+        sender, receiver = socket.socketpair()
+        received = bytearray()
+        with sender, receiver:
+            thread = threading.Thread(target=self._receive_all, args=(receiver, received))
+            thread.start()
+            sent = send_file(sender, self.file, 1000)
+            sender.close()
+            thread.join()
+        self.assertEqual(sent, len(self.data) - 1000)
+        self.assertEqual(bytes(received), self.data[1000:])
+
+    def test_send_file_fallback(self):
+        data_con = MagicMock(spec=['sendall'])
+        sent = send_file(data_con, self.file, 10, block_size=100000)
+        self.assertEqual(sent, len(self.data) - 10)
+        self.assertEqual(data_con.sendall.call_count, 3)
+        self.assertEqual(b''.join(args[0] for args, _ in data_con.sendall.call_args_list),
+                         self.data[10:])
+
+    def test_receive_file(self):
+        sender, receiver = socket.socketpair()
+        with sender, receiver, tempfile.TemporaryFile() as target:
+            thread = threading.Thread(target=self._send_and_close, args=(sender,))
+            thread.start()
+            received = receive_file(receiver, target, block_size=4096)
+            thread.join()
+            target.seek(0)
+            self.assertEqual(target.read(), self.data)
+        self.assertEqual(received, len(self.data))
+
+    def test_deflate_send_file(self):
+        sender, receiver = socket.socketpair()
+        received = bytearray()
+        with sender, receiver:
+            thread = threading.Thread(target=self._receive_all, args=(receiver, received))
+            thread.start()
+            data_con = DeflateConnection(sender, level=9)
+            sent = send_file(data_con, self.file, 0, block_size=4096)
+            data_con.close()
+            thread.join()
+        self.assertEqual(sent, len(self.data))
+        self.assertLess(len(received), len(self.data) // 10)
+        self.assertEqual(zlib.decompress(bytes(received)), self.data)
+
+    def test_deflate_receive_file(self):
+        compressed = zlib.compress(self.data)
+        data_con = MagicMock()
+        data_con.recv.side_effect = [compressed[:100], compressed[100:], b'']
+        with tempfile.TemporaryFile() as target:
+            received = receive_file(DeflateConnection(data_con), target, block_size=4096)
+            target.seek(0)
+            self.assertEqual(target.read(), self.data)
+        self.assertEqual(received, len(self.data))
+
+    def test_preallocate(self):
+        with tempfile.TemporaryFile() as target:
+            preallocate(target, 12345)
+            target.seek(0, 2)
+            self.assertEqual(target.tell(), 12345)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -52,11 +52,89 @@ class TestCli(unittest.TestCase):
                                           '--list', 'remote_path'])
         self.assertEqual(result.exit_code, 0)
         mock_connect.assert_called_once_with('example.com', 'user', 'password')
-        mock_download.assert_called_once_with('remote_path', 'local_path')
-        mock_upload.assert_called_once_with('local_path', 'remote_path')
+        mock_download.assert_called_once_with('remote_path', 'local_path', workers=1,
+                                              resume=False, segments=1)
+        mock_upload.assert_called_once_with('local_path', 'remote_path', workers=1,
+                                            resume=False)
         mock_list.assert_called_once_with('remote_path', True, True)
         mock_close.assert_called_once()
 
+    @patch.object(FtpClient, 'connect')
+    @patch.object(FtpClient, 'download')
+    @patch.object(FtpClient, 'upload')
+    @patch.object(FtpClient, 'close')
+    def test_ftp_client_workers(self, mock_close, mock_upload, mock_download, mock_connect):
+        """
+        Tests that the number of workers is passed to FTP transfers.
+        """
+        result = self.runner.invoke(cli, ['--client_type', 'ftp', '--host', 'example.com', '--user',
+                                          'user', '--pass', 'password', '--workers', '8',
+                                          '--resume', '--segments', '3', '--download',
+                                          'remote_path', 'local_path', '--upload', 'local_path',
+                                          'remote_path'])
+        self.assertEqual(result.exit_code, 0)
+        mock_download.assert_called_once_with('remote_path', 'local_path', workers=8,
+                                              resume=True, segments=3)
+        mock_upload.assert_called_once_with('local_path', 'remote_path', workers=8,
+                                            resume=True)
+
+        result = self.runner.invoke(cli, ['--client_type', 'ftp', '--host', 'example.com', '--user',
+                                          'user', '--pass', 'password', '--workers', '0'])
+        self.assertEqual(result.exit_code, 2)
+
+    @patch.object(FtpClient, 'connect')
+    @patch.object(FtpClient, 'sync')
+    @patch.object(FtpClient, 'close')
+    def test_ftp_client_sync(self, mock_close, mock_sync, mock_connect):
+        """
+        Tests that --sync runs an FTP sync and is refused for WebDav clients.
+        """
+        result = self.runner.invoke(cli, ['--client_type', 'ftp', '--host', 'example.com', '--user',
+                                          'user', '--pass', 'password', '--sync', 'local_path',
+                                          'remote_path', '--pull', '--delete', '--workers', '4'])
+        self.assertEqual(result.exit_code, 0)
+        mock_sync.assert_called_once_with('local_path', 'remote_path', download=True, delete=True,
+                                          workers=4)
+
+        result = self.runner.invoke(cli, ['--client_type', 'yadisk', '--token', 'token', '--sync',
+                                          'local_path', 'remote_path'])
+        self.assertEqual(result.exit_code, 2)
+
+    @patch.object(FtpClient, 'connect')
+    @patch.object(FtpClient, 'enable_compression')
+    @patch.object(FtpClient, 'close')
+    def test_ftp_client_compress(self, mock_close, mock_compression, mock_connect):
+        """
+        Tests that --compress enables MODE Z at the given level.
+        """
+        result = self.runner.invoke(cli, ['--client_type', 'ftp', '--host', 'example.com', '--user',
+                                          'user', '--pass', 'password', '--compress', '9'])
+        self.assertEqual(result.exit_code, 0)
+        mock_compression.assert_called_once_with(9)
+
+    @patch.object(FtpClient, 'connect')
+    @patch.object(FtpClient, 'fxp')
+    @patch.object(FtpClient, 'close')
+    def test_ftp_client_fxp(self, mock_close, mock_fxp, mock_connect):
+        """
+        Tests that --fxp logs in to both hosts and copies between them.
+        """
+        result = self.runner.invoke(cli, ['--client_type', 'ftp', '--host', 'example.com', '--user',
+                                          'user', '--pass', 'password', '--fxp', 'backup',
+                                          'copy', '--target-host', 'target.com', '--target-user',
+                                          'user2', '--target-pass', 'password2'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(mock_connect.call_args_list[1].args,
+                         ('target.com', 'user2', 'password2'))
+        self.assertIsInstance(mock_fxp.call_args.args[0], FtpClient)
+        self.assertEqual(mock_fxp.call_args.args[1:], ('backup', 'copy'))
+        self.assertEqual(mock_close.call_count, 2)
+
+        result = self.runner.invoke(cli, ['--client_type', 'ftp', '--host', 'example.com', '--user',
+                                          'user', '--pass', 'password', '--fxp', 'backup', 'copy'])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn('--target-host', result.output)
+
     @patch.object(WebDavClient, 'set_token')
     @patch.object(WebDavClient, 'set_auth')
     @patch.object(WebDavClient, 'download')
@@ -72,8 +150,9 @@ class TestCli(unittest.TestCase):
                                      'remote_path', '--list', 'directory'])
         self.assertEqual(result.exit_code, 0)
         mock_token.assert_called_once_with('token')
-        mock_download.assert_called_once_with('remote_path', 'local_path')
-        mock_upload.assert_called_once_with('local_path', 'remote_path')
+        mock_download.assert_called_once_with('remote_path', 'local_path', resume=False,
+                                              segments=1, workers=1)
+        mock_upload.assert_called_once_with('local_path', 'remote_path', workers=1)
         mock_list.assert_called_once_with('directory')
 
         result = self.runner.invoke(cli, ['--client_type', 'cloud_mail', '--user', 'user', '--pass',
@@ -1,7 +1,10 @@
+import io
 import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 
+import requests
 from dotenv import load_dotenv, find_dotenv
 from webdav_api_client.webdav_client import WebDavClient
 
@@ -62,15 +65,155 @@ class TestWebdavClient(unittest.TestCase):
         local_file = "path/to/local_file"
         self.client.connection = MagicMock()
         self.client.connection.send_request.return_value.status_code = 200
-        self.client.connection.send_request.return_value.content = b"file_content"
+        self.client.connection.send_request.return_value.iter_content.return_value = [
+            b"file_", b"content"]
 
-        self.client.download_file(remote_file, local_file)
+        self.assertTrue(self.client.download_file(remote_file, local_file))
 
-        self.client.connection.send_request.assert_called_once_with("GET", remote_file)
+        self.client.connection.send_request.assert_called_once_with("GET", remote_file,
+                                                                    add_headers=None,
+                                                                    stream=True)
+        self.client.connection.send_request.return_value.iter_content.assert_called_once_with(
+            self.client.chunk_size)
+        self.assertFalse(os.path.exists(local_file + ".part"))
 
         with open(local_file, "rb") as file:
             self.assertEqual(file.read(), b"file_content")
 
+    def test_download_file_interrupted_keeps_target(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, "file")
+            with open(local_file, "wb") as file:
+                file.write(b"old")
+
+            def interrupted(chunk_size):
+                yield b"partial"
+                raise requests.ConnectionError("reset")
+            self.client.connection = MagicMock()
+            self.client.connection.send_request.return_value.status_code = 200
+            self.client.connection.send_request.return_value.headers = {}
+            self.client.connection.send_request.return_value.iter_content = interrupted
+
+            self.assertFalse(self.client.download_file("remote", local_file))
+            with open(local_file, "rb") as file:
+                self.assertEqual(file.read(), b"old")
+            self.assertEqual(os.listdir(local_dir), ["file"])
+            self.client.connection.send_request.return_value.close.assert_called_once()
+
+    def test_download_file_resume(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, "file")
+
+            def interrupted(chunk_size):
+                yield b"file_"
+                raise requests.ConnectionError("reset")
+            self.client.connection = MagicMock()
+            first = MagicMock(status_code=200, headers={"ETag": '"v1"'}, iter_content=interrupted)
+            second = MagicMock(status_code=206, headers={"Content-Range": "bytes 5-11/12"})
+            second.iter_content.return_value = [b"content"]
+            self.client.connection.send_request.side_effect = [first, second]
+
+            self.assertFalse(self.client.download_file("remote", local_file))
+            self.assertEqual(sorted(os.listdir(local_dir)), ["file.part", "file.part.etag"])
+
+            self.assertTrue(self.client.download_file("remote", local_file, resume=True))
+            self.client.connection.send_request.assert_called_with(
+                "GET", "remote", add_headers={"Range": "bytes=5-", "If-Range": '"v1"'},
+                stream=True)
+            with open(local_file, "rb") as file:
+                self.assertEqual(file.read(), b"file_content")
+            self.assertEqual(os.listdir(local_dir), ["file"])
+
+    def test_download_file_resume_changed_file(self):
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, "file")
+            with open(local_file + ".part", "wb") as file:
+                file.write(b"stale")
+            with open(local_file + ".part.etag", "w") as file:
+                file.write('"v1"')
+            self.client.connection = MagicMock()
+            self.client.connection.send_request.return_value.status_code = 200
+            self.client.connection.send_request.return_value.headers = {"ETag": '"v2"'}
+            self.client.connection.send_request.return_value.iter_content.return_value = [
+                b"new"]
+
+            self.assertTrue(self.client.download_file("remote", local_file, resume=True))
+            with open(local_file, "rb") as file:
+                self.assertEqual(file.read(), b"new")
+            self.assertEqual(os.listdir(local_dir), ["file"])
+
+    def test_download_file_segmented(self):
+        data = bytes(range(256)) * 100
+        self.client.MIN_SEGMENT_SIZE = 1000
+        self.client.chunk_size = 700
+
+        def ranged_get(command, remote_file, add_headers=None, stream=False):
+            start, end = map(int, add_headers["Range"][len("bytes="):].split("-"))
+            self.assertEqual(add_headers["If-Match"], '"v1"')
+            resp = MagicMock(status_code=206,
+                             headers={"Content-Range": f"bytes {start}-{end}/{len(data)}"})
+            body = data[start:end + 1]
+            resp.iter_content.return_value = [body[i:i + 700] for i in range(0, len(body), 700)]
+            return resp
+        self.client.connection = MagicMock()
+        self.client.connection.send_request.side_effect = ranged_get
+
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, "file")
+            self.assertTrue(self.client.download_file("remote", local_file, '"v1"',
+                                                      size=str(len(data)), segments=4))
+            with open(local_file, "rb") as file:
+                self.assertEqual(file.read(), data)
+            self.assertEqual(os.listdir(local_dir), ["file"])
+        self.assertEqual(self.client.connection.send_request.call_count, 4)
+
+    def test_download_file_segmented_ignored_by_server(self):
+        self.client.MIN_SEGMENT_SIZE = 1000
+        self.client.connection = MagicMock()
+        self.client.connection.send_request.return_value.status_code = 200
+        self.client.connection.send_request.return_value.headers = {}
+        self.client.connection.send_request.return_value.iter_content.return_value = [
+            b"x" * 4000]
+
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, "file")
+            self.assertTrue(self.client.download_file("remote", local_file, size=4000,
+                                                      segments=2))
+            with open(local_file, "rb") as file:
+                self.assertEqual(file.read(), b"x" * 4000)
+            self.assertEqual(os.listdir(local_dir), ["file"])
+        self.client.connection.send_request.assert_called_with("GET", "remote",
+                                                               add_headers=None, stream=True)
+
+    def test_download_file_segmented_connection_error(self):
+        self.client.MIN_SEGMENT_SIZE = 1000
+        self.client.connection = MagicMock()
+        self.client.connection.send_request.side_effect = requests.ConnectionError("refused")
+
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, "file")
+            self.assertFalse(self.client.download_file("remote", local_file, size=4000,
+                                                       segments=2))
+            self.assertEqual(os.listdir(local_dir), [])
+
+    def test_download_file_segmented_short_range(self):
+        self.client.MIN_SEGMENT_SIZE = 1000
+
+        def ranged_get(command, remote_file, add_headers=None, stream=False):
+            start, end = map(int, add_headers["Range"][len("bytes="):].split("-"))
+            resp = MagicMock(status_code=206,
+                             headers={"Content-Range": f"bytes {start}-{end}/4000"})
+            resp.iter_content.return_value = [b"x" * (end - start)]
+            return resp
+        self.client.connection = MagicMock()
+        self.client.connection.send_request.side_effect = ranged_get
+
+        with tempfile.TemporaryDirectory() as local_dir:
+            local_file = os.path.join(local_dir, "file")
+            self.assertFalse(self.client.download_file("remote", local_file, size=4000,
+                                                       segments=2))
+            self.assertEqual(os.listdir(local_dir), [])
+
     def test_upload_with_existing_local_dir(self):
         with patch.object(self.client, 'make_directory') as mock_make_dir, \
                 patch.object(self.client, 'upload_directory') as mock_upload_dir:
@@ -120,6 +263,76 @@ class TestWebdavClient(unittest.TestCase):
                 mock_download_dir.assert_called_once()
                 mock_download_file.assert_not_called()
 
+    def test_upload_directory_parallel(self):
+        self.client.make_directory = MagicMock()
+        self.client.upload_file = MagicMock(return_value=True)
+        with tempfile.TemporaryDirectory() as local_dir:
+            os.makedirs(os.path.join(local_dir, "sub", "deeper"))
+            for name in ("a.txt", "b.txt", "sub/c.txt", "sub/deeper/d.txt"):
+                open(os.path.join(local_dir, name), "w").close()
+
+            self.client.upload_directory(local_dir, "/backup", workers=8)
+
+            self.assertEqual([call.args[0] for call in self.client.make_directory.call_args_list],
+                             ["/backup", "/backup/sub", "/backup/sub/deeper"])
+            self.assertEqual(sorted(call.args[1] for call in
+                                    self.client.upload_file.call_args_list),
+                             ["/backup/a.txt", "/backup/b.txt", "/backup/sub/c.txt",
+                              "/backup/sub/deeper/d.txt"])
+        self.assertEqual(self.client.connection.pool_size, 10)
+
+    def test_download_directory_parallel(self):
+        listings = {
+            "/remote/": [
+                {'path': '/remote/', 'displayname': 'remote', 'isDir': True},
+                {'path': '/remote/sub/', 'displayname': 'sub', 'isDir': True},
+                {'path': '/remote/a.txt', 'displayname': 'a.txt', 'isDir': False,
+                 'etag': '"a"', 'length': '1'},
+            ],
+            "/remote/sub/": [
+                {'path': '/remote/sub/', 'displayname': 'sub', 'isDir': True},
+                {'path': '/remote/sub/b.txt', 'displayname': 'b.txt', 'isDir': False,
+                 'etag': '"b"', 'length': '2'},
+            ],
+        }
+        self.client.list_directory = MagicMock(side_effect=lambda path: listings[path])
+        self.client.download_file = MagicMock(return_value=True)
+        with tempfile.TemporaryDirectory() as local_dir:
+            self.client.download_directory("/remote/", local_dir, workers=16)
+
+            self.assertTrue(os.path.isdir(os.path.join(local_dir, "sub")))
+            self.assertEqual(sorted(call.args for call in
+                                    self.client.download_file.call_args_list),
+                             [('/remote/a.txt', os.path.join(local_dir, 'a.txt'), '"a"', False,
+                               '1', 1),
+                              ('/remote/sub/b.txt', os.path.join(local_dir, 'sub', 'b.txt'), '"b"',
+                               False, '2', 1)])
+        self.assertEqual(self.client.connection.pool_size, 16)
+
+    def test_upload_parallel_reports_failures(self):
+        self.client.make_directory = MagicMock()
+        self.client.upload_file = MagicMock(
+            side_effect=lambda local_file, remote_file: not local_file.endswith("b.txt"))
+        with tempfile.TemporaryDirectory() as parent_dir:
+            local_dir = os.path.join(parent_dir, "dir")
+            os.makedirs(local_dir)
+            for name in ("a.txt", "b.txt"):
+                open(os.path.join(local_dir, name), "w").close()
+            with patch('builtins.print') as mock_print:
+                self.assertFalse(self.client.upload(local_dir, "/backup", workers=4))
+        mock_print.assert_called_with('Upload finished with errors.')
+
+    def test_download_directory_parallel_sizes_pool_for_segments(self):
+        self.client.list_directory = MagicMock(return_value=[
+            {'path': '/remote/', 'displayname': 'remote', 'isDir': True},
+            {'path': '/remote/a.txt', 'displayname': 'a.txt', 'isDir': False, 'length': '1'},
+        ])
+        self.client.download_file = MagicMock(side_effect=requests.ConnectionError("reset"))
+        with tempfile.TemporaryDirectory() as local_dir, patch('builtins.print'):
+            self.assertFalse(self.client.download_directory("/remote/", local_dir, segments=4,
+                                                            workers=8))
+        self.assertEqual(self.client.connection.pool_size, 32)
+
     def test_download_directory(self):
         remote_directory = "/path/to/remote_directory"
         local_directory = "path/to/local_directory"
@@ -146,7 +359,8 @@ class TestWebdavClient(unittest.TestCase):
         self.client.download(remote_path, local_path)
         self.client.download_file.assert_called_once_with('/path/to/remote_file/',
                                                           os.path.abspath(os.path.join(local_path,
-                                                                                       'file.txt')))
+                                                                                       'file.txt')),
+                                                          None, False, None, 1)
 
     def test_list_directory(self):
         remote_path = "/path/to/remote_directory/"
@@ -227,6 +441,53 @@ class TestWebdavClient(unittest.TestCase):
 
         self.assertEqual(result, expected_result)
 
+    def _propfind_response(self, *nodes):
+        """Builds a streamed PROPFIND response listing (href, displayname, length) nodes,
+        directories have a length of None."""
+        body = ''.join(
+            f'<d:response><d:href>{href}</d:href><d:propstat><d:prop>'
+            f'<d:displayname>{name}</d:displayname>' +
+            ('<d:resourcetype><d:collection/></d:resourcetype>' if length is None else
+             f'<d:getcontentlength>{length}</d:getcontentlength><d:getetag>e</d:getetag>'
+             f'<d:getcontenttype>text/plain</d:getcontenttype>') +
+            '</d:prop></d:propstat></d:response>' for href, name, length in nodes)
+        response = MagicMock(status_code=207)
+        response.raw = io.BytesIO(f'<d:multistatus xmlns:d="DAV:">{body}</d:multistatus>'
+                                  .encode())
+        return response
+
+    def test_iter_directory(self):
+        response = self._propfind_response(('/dir/', 'dir', None), ('/dir/a.txt', 'a.txt', 5))
+        self.client.connection.send_request = MagicMock(return_value=response)
+        nodes = list(self.client.iter_directory('dir'))
+        self.client.connection.send_request.assert_called_once_with(
+            "PROPFIND", "/dir/", add_headers={"Depth": "1"}, stream=True)
+        self.assertEqual([node['path'] for node in nodes], ['/dir/', '/dir/a.txt'])
+        self.assertEqual(nodes[1]['length'], '5')
+        response.close.assert_called_once()
+
+    def test_iter_directory_recursive(self):
+        listings = {
+            '/dir/': self._propfind_response(('/dir/', 'dir', None), ('/dir/sub/', 'sub', None),
+                                             ('/dir/a.txt', 'a.txt', 5)),
+            '/dir/sub/': self._propfind_response(('/dir/sub/', 'sub', None),
+                                                 ('/dir/sub/b.txt', 'b.txt', 7)),
+        }
+        self.client.connection.send_request = MagicMock(
+            side_effect=lambda command, path, **kwargs: listings[path])
+        result = [(node['path'], indent) for node, indent in
+                  self.client.iter_directory_recursive('/dir/')]
+        self.assertEqual(result, [('/dir/', ''), ('/dir/sub/', '\t'), ('/dir/sub/b.txt', '\t'),
+                                  ('/dir/a.txt', '')])
+
+    def test_list_directory_recursive_returns_nodes(self):
+        self.client.connection.send_request = MagicMock(return_value=self._propfind_response(
+            ('/dir/', 'dir', None), ('/dir/a.txt', 'a.txt', 5)))
+        with patch('builtins.print') as mock_print:
+            nodes = self.client.list_directory_recursive('dir')
+        self.assertEqual([node['path'] for node in nodes], ['/dir/', '/dir/a.txt'])
+        mock_print.assert_called_with('\ta.txt (5 bytes)')
+
     def test_make_directory(self):
         remote_directory = "/path/to/remote_dir"
         self.client.connection = MagicMock()
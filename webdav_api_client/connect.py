@@ -4,7 +4,11 @@ WebDav Connection module.
 This module contains the Connection class that handles the connection to the WebDav API.
 """
 
+import base64
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
 
 
 class Connection:
@@ -13,17 +17,67 @@ class Connection:
     YADISK_URL = 'https://webdav.yandex.ru/'
     CLOUD_MAIL_URL = 'https://webdav.cloud.mail.ru'
     PORT = 443
+    POOL_SIZE = 10
 
-    def __init__(self, cloud_type='yadisk'):
+    def __init__(self, cloud_type='yadisk', pool_size=POOL_SIZE):
+        """
+        Args:
+            cloud_type (str): The storage to connect to, 'yadisk' or 'cloud_mail'.
+            pool_size (int): The number of keep-alive connections to keep open, at least
+                the number of threads sending requests at once.
+        """
         self.token = None
         self.username = None
         self.password = None
+        self.pool_size = pool_size
+        self._session = None
+        self._credentials = None
+        self._lock = threading.Lock()
         if cloud_type == 'yadisk':
             self.url = self.YADISK_URL
         elif cloud_type == 'cloud_mail':
             self.url = self.CLOUD_MAIL_URL
 
-    def send_request(self, command, add_url="/", add_headers=None, data=None):
+    @property
+    def session(self):
+        """
+        The persistent HTTP session, created on first use.
+
+        Its connections are kept alive and reused, so consecutive requests skip the TCP and
+        TLS handshakes. The connection pool is thread-safe and holds up to `pool_size`
+        connections. The Authorization header is built once per set of credentials.
+
+        Returns:
+            requests.Session: The session.
+        """
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update({"Accept": "*/*"})
+                self._session = session
+            credentials = (self.token, self.username, self.password)
+            if credentials != self._credentials:
+                if self.token is not None:
+                    authorization = f"OAuth {self.token}"
+                else:
+                    authorization = "Basic " + base64.b64encode(
+                        f"{self.username}:{self.password}".encode()).decode()
+                self._session.headers["Authorization"] = authorization
+                self._credentials = credentials
+            return self._session
+
+    def close(self):
+        """Close the keep-alive connections of the session."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+                self._credentials = None
+
+    def send_request(self, command, add_url="/", add_headers=None, data=None, stream=False):
         """
         Send an HTTP request to WebDav API.
 
@@ -32,6 +86,8 @@ class Connection:
             add_url (str): Additional URL path to append to the base URL.
             add_headers (dict): Additional headers to include in the request.
             data: Optional data to include in the request body.
+            stream (bool): Whether to leave the response body unread, to be consumed
+                incrementally from `iter_content` or `raw`.
 
         Returns:
             requests.Response: The response from the API.
@@ -41,20 +97,8 @@ class Connection:
             print("Error: No login/password or token for WebDav storage account.")
             exit()
 
-        if add_headers is None:
-            add_headers = {}
-
-        headers = {"Accept": "*/*"}
-        auth = None
-
-        if self.token is not None:
-            headers["Authorization"] = f"OAuth {self.token}"
-        else:
-            auth = (self.username, self.password)
-
-        headers.update(add_headers)
         url = self.url + add_url
-        res = requests.request(command, url, headers=headers, auth=auth, data=data)
+        res = self.session.request(command, url, headers=add_headers, data=data, stream=stream)
 
         if res.status_code in [401, 403]:
             print("Error: Invalid login/password for WebDav storage account.")
@@ -1,5 +1,8 @@
 import os
 import xml.etree.ElementTree as Et
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 
 from webdav_api_client.connect import Connection
 
@@ -9,12 +12,16 @@ class WebDavClient:
     Client for WebDav API.
     """
 
+    CHUNK_SIZE = 256 * 1024
+    MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+
     def __init__(self, cloud_type='yadisk'):
         if cloud_type == 'yadisk':
             self.connection = Connection('yadisk')
         elif cloud_type == 'cloud_mail':
             self.connection = Connection('cloud_mail')
         self.namespaces = {'d': 'DAV:'}
+        self.chunk_size = self.CHUNK_SIZE
 
     def set_token(self, token):
         self.connection.token = token
@@ -34,30 +41,52 @@ class WebDavClient:
             if resp.status_code not in [201, 405]:
                 print(f"Error uploading file {local_file} to "
                       f"{remote_file}: {resp.status_code} {resp.text}")
+                return False
+        return True
 
-    def upload_directory(self, local_dir: str, remote_dir: str) -> None:
+    def upload_directory(self, local_dir: str, remote_dir: str, workers: int = 1) -> bool:
         """
         Uploads a directory to the server
 
+        With several workers, the remote directories are created first, parents before
+        children, and then the files are uploaded concurrently.
+
         :param local_dir: local directory to upload
         :param remote_dir: remote directory to upload to
+        :param workers: number of files to upload concurrently
+        :return: True if every file was uploaded, False otherwise
         """
+        if workers > 1:
+            files = []
+            for directory, _, file_names in os.walk(local_dir):
+                relative_path = os.path.relpath(directory, local_dir)
+                remote_path = remote_dir if relative_path == '.' else \
+                    os.path.join(remote_dir, relative_path).replace('\\', '/')
+                self.make_directory(remote_path)
+                files.extend((os.path.join(directory, file_name).replace('\\', '/'),
+                              remote_path.rstrip('/') + '/' + file_name)
+                             for file_name in file_names)
+            return not self._run_parallel(files, workers, lambda item: self.upload_file(*item))
         self.make_directory(remote_dir)
+        uploaded = True
         for file_name in os.listdir(local_dir):
             file_path = os.path.join(local_dir, file_name).replace('\\', '/')
             if os.path.isdir(file_path):
-                self.upload_directory(file_path, os.path.join(remote_dir, file_name)
-                                      .replace('\\', '/'))
+                uploaded = self.upload_directory(file_path, os.path.join(remote_dir, file_name)
+                                                 .replace('\\', '/')) and uploaded
             else:
-                self.upload_file(file_path, os.path.join(remote_dir, file_name)
-                                 .replace('\\', '/'))
+                uploaded = self.upload_file(file_path, os.path.join(remote_dir, file_name)
+                                            .replace('\\', '/')) and uploaded
+        return uploaded
 
-    def upload(self, local_dir: str, remote_dir: str) -> None:
+    def upload(self, local_dir: str, remote_dir: str, workers: int = 1) -> bool:
         """
         Uploads a file or directory to the server
 
         :param local_dir: local directory to upload
         :param remote_dir: remote directory to upload to
+        :param workers: number of files to upload concurrently
+        :return: True if everything was uploaded, False otherwise
         """
         path_to_create = ''
         local_dir = os.path.abspath(local_dir)
@@ -74,49 +103,269 @@ class WebDavClient:
             for sub_dir in remote_dir.strip('/').split('/'):
                 path_to_create = os.path.join(path_to_create, sub_dir).replace('\\', '/')
                 self.make_directory(path_to_create)
-            self.upload_directory(local_dir, remote_dir)
+            uploaded = self.upload_directory(local_dir, remote_dir, workers)
         else:
             for sub_dir in remote_dir.strip('/').split('/'):
                 path_to_create = os.path.join(path_to_create, sub_dir).replace('\\', '/')
                 self.make_directory(path_to_create)
             remote_dir = os.path.join(remote_dir, os.path.basename(local_dir)).replace('\\', '/')
             print(f'Uploading file {local_dir} to {remote_dir}')
-            self.upload_file(local_dir, os.path.join(remote_dir,
-                                                     os.path.basename(local_dir))
-                             .replace('\\', '/'))
-        print('Upload complete')
+            uploaded = self.upload_file(local_dir, os.path.join(remote_dir,
+                                                                os.path.basename(local_dir))
+                                        .replace('\\', '/'))
+        if uploaded:
+            print('Upload complete')
+        else:
+            print('Upload finished with errors.')
+        return uploaded
 
-    def download_file(self, remote_file, local_file):
-        """Download remote file to disk."""
+    def download_file(self, remote_file, local_file, etag=None, resume=False, size=None,
+                      segments=1):
+        """
+        Download remote file to disk.
+
+        The body is streamed in chunks of `chunk_size` bytes to a ".part" file next to the
+        target, which atomically replaces the target once complete, so memory use does not
+        depend on the file size and an interrupted download never leaves a truncated file.
+
+        If the server reports a strong etag for the file (or `etag` is given, as found by
+        `parse_list`), an interrupted download keeps its ".part" file and the etag in a
+        ".part.etag" file. In resume mode such a download is continued with a Range request,
+        guarded by If-Range, so a file changed in the meantime is downloaded in full again.
+
+        With several segments, a file of known `size` (the getcontentlength of its node) is
+        split into byte ranges that are fetched concurrently, see `_download_segmented`.
+        """
         local_file = os.path.abspath(local_file)
         directory = os.path.dirname(local_file)
         if not os.path.exists(directory):
             os.makedirs(directory)
-        resp = self.connection.send_request("GET", remote_file)
-        if resp.status_code == 200:
-            with open(local_file, "wb") as file:
-                file.write(resp.content)
-        else:
-            print(f"Error downloading file {remote_file}: {resp.status_code} {resp.text}")
+        part_file = local_file + ".part"
+        etag_file = part_file + ".etag"
+        offset, partial_etag = (self._partial_download(part_file, etag_file) if resume
+                                else (0, None))
+        if segments > 1 and not offset and size is not None \
+                and int(size) >= 2 * self.MIN_SEGMENT_SIZE:
+            return self._download_segmented(remote_file, local_file, int(size), etag, segments)
+        headers = {"Range": f"bytes={offset}-", "If-Range": partial_etag} if offset else None
+        resp = self.connection.send_request("GET", remote_file, add_headers=headers, stream=True)
+        try:
+            if offset and resp.status_code == 416:
+                self._remove_partial(part_file, etag_file)
+                return self.download_file(remote_file, local_file, etag)
+            if resp.status_code == 206 and not str(resp.headers.get("Content-Range", "")) \
+                    .startswith(f"bytes {offset}-"):
+                print(f"Error downloading file {remote_file}: unexpected Content-Range")
+                return False
+            if resp.status_code not in (200, 206):
+                print(f"Error downloading file {remote_file}: {resp.status_code} {resp.text}")
+                return False
+            if resp.status_code == 206:
+                print(f"Resuming download of {remote_file} from byte {offset}")
+            else:
+                partial_etag = resp.headers.get("ETag") or etag
+            resumable = isinstance(partial_etag, str) and not partial_etag.startswith("W/")
+            try:
+                if resumable:
+                    with open(etag_file, "w") as file:
+                        file.write(partial_etag)
+                with open(part_file, "ab" if resp.status_code == 206 else "wb") as file:
+                    for chunk in resp.iter_content(self.chunk_size):
+                        file.write(chunk)
+                os.replace(part_file, local_file)
+            except (OSError, requests.RequestException) as error:
+                if not resumable:
+                    self._remove_partial(part_file, etag_file)
+                print(f"Error downloading file {remote_file}: {error}")
+                return False
+            self._remove_partial(part_file, etag_file)
+            return True
+        finally:
+            resp.close()
+
+    def _download_segmented(self, remote_file, local_file, size, etag, segments):
+        """
+        Download a file as byte ranges over parallel pooled connections.
+
+        The ".part" file is preallocated to `size` and every range is written at its offset,
+        each worker through its own file descriptor. With a strong etag, every range request
+        carries If-Match, so a file changed during the download fails instead of mixing
+        versions. Every range must deliver exactly its own bytes, otherwise the ".part" file
+        is removed. A server that ignores Range and answers 200 gets a single-stream download.
+        """
+        segments = max(1, min(segments, size // self.MIN_SEGMENT_SIZE))
+        segment_size = -(-size // segments)
+        ranges = [(start, min(start + segment_size, size) - 1)
+                  for start in range(0, size, segment_size)]
+        if not isinstance(etag, str) or etag.startswith("W/"):
+            etag = None
+        part_file = local_file + ".part"
+        with open(part_file, "wb") as file:
+            file.truncate(size)
+
+        def fetch(start, end):
+            """Return True once the range is written, False if it failed, None on a 200."""
+            headers = {"Range": f"bytes={start}-{end}"}
+            if etag:
+                headers["If-Match"] = etag
+            resp = None
+            try:
+                resp = self.connection.send_request("GET", remote_file, add_headers=headers,
+                                                    stream=True)
+                if resp.status_code == 200:
+                    return None
+                if resp.status_code != 206 or not str(resp.headers.get("Content-Range", "")) \
+                        .startswith(f"bytes {start}-{end}/{size}"):
+                    return False
+                descriptor = os.open(part_file, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+                try:
+                    offset = start
+                    for chunk in resp.iter_content(self.chunk_size):
+                        chunk = chunk[:end + 1 - offset]
+                        self._write_at(descriptor, chunk, offset)
+                        offset += len(chunk)
+                finally:
+                    os.close(descriptor)
+                return offset == end + 1
+            except (OSError, requests.RequestException):
+                return False
+            finally:
+                if resp is not None:
+                    resp.close()
+
+        results = None
+        try:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                results = list(executor.map(lambda item: fetch(*item), ranges))
+        finally:
+            if results is None or not all(results):
+                os.remove(part_file)
+        if None in results:
+            return self.download_file(remote_file, local_file, etag)
+        if not all(results):
+            print(f"Error downloading file {remote_file}: a segment failed or the file changed")
+            return False
+        os.replace(part_file, local_file)
+        return True
 
-    def download_directory(self, remote_directory, local_directory):
-        """Download remote directory to disk."""
+    @staticmethod
+    def _write_at(descriptor, data, offset):
+        """Write all of data at offset of the file, with pwrite where the OS has it."""
+        view = memoryview(data)
+        while view:
+            if hasattr(os, "pwrite"):
+                written = os.pwrite(descriptor, view, offset)
+            else:
+                os.lseek(descriptor, offset, os.SEEK_SET)
+                written = os.write(descriptor, view)
+            view = view[written:]
+            offset += written
+
+    @staticmethod
+    def _partial_download(part_file, etag_file):
+        """Return the length and the etag of an interrupted download, (0, None) if none."""
+        try:
+            with open(etag_file) as file:
+                etag = file.read().strip()
+            offset = os.path.getsize(part_file)
+        except OSError:
+            return 0, None
+        return (offset, etag) if offset and etag else (0, None)
+
+    @staticmethod
+    def _remove_partial(part_file, etag_file):
+        """Remove what is left of an interrupted download."""
+        for path in (part_file, etag_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def download_directory(self, remote_directory, local_directory, resume=False, segments=1,
+                           workers=1):
+        """
+        Download remote directory to disk, return True if every file was downloaded.
+
+        With several workers, the tree is listed and the local directories are created
+        first, and then the files are downloaded concurrently.
+        """
+        if workers > 1:
+            files = self._collect_remote_files(remote_directory, local_directory)
+            return not self._run_parallel(files, workers, lambda file: self.download_file(
+                file[0]['path'], file[1], file[0].get('etag'), resume, file[0].get('length'),
+                segments), workers * segments)
         remote_directory = '/' + remote_directory.strip("/") + "/"
         local_directory = os.path.abspath(local_directory)
         if not os.path.exists(local_directory):
             os.makedirs(local_directory)
         directory_contents = self.list_directory(remote_directory)
+        downloaded = True
         for file in directory_contents:
             if file['path'].strip('/') == remote_directory.strip('/'):
                 continue
             if file['isDir']:
-                self.download_directory(file['path'], local_directory + os.sep +
-                                        file['displayname'])
+                downloaded = self.download_directory(file['path'], local_directory + os.sep +
+                                                     file['displayname'], resume,
+                                                     segments) and downloaded
+            else:
+                downloaded = self.download_file(
+                    file['path'], local_directory + os.sep + file['displayname'],
+                    file.get('etag'), resume, file.get('length'), segments) and downloaded
+        return downloaded
+
+    def _collect_remote_files(self, remote_directory, local_directory):
+        """
+        Create the local directories of a remote tree and return (node, local_file) pairs
+        for all of its files.
+        """
+        remote_directory = '/' + remote_directory.strip("/") + "/"
+        local_directory = os.path.abspath(local_directory)
+        if not os.path.exists(local_directory):
+            os.makedirs(local_directory)
+        files = []
+        for file in self.list_directory(remote_directory):
+            if file['path'].strip('/') == remote_directory.strip('/'):
+                continue
+            local_path = local_directory + os.sep + file['displayname']
+            if file['isDir']:
+                files.extend(self._collect_remote_files(file['path'], local_path))
             else:
-                self.download_file(file['path'], local_directory + os.sep + file['displayname'])
+                files.append((file, local_path))
+        return files
+
+    def _run_parallel(self, items, workers, action, connections=None):
+        """
+        Run action for every item on a pool of at most `workers` threads.
+
+        The connection pool is enlarged to `connections` (`workers` by default) first, so
+        every request in flight keeps its own keep-alive connection. An item whose action
+        raises a network or file error fails on its own. Returns the items whose action did
+        not return True.
+        """
+        self._ensure_pool_size(connections or workers)
 
-    def download(self, remote_path, local_path):
-        """Download file or directory."""
+        def run(item):
+            try:
+                return action(item)
+            except (OSError, requests.RequestException) as error:
+                print(f"Error transferring {item}: {error}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items)))) as executor:
+            results = list(executor.map(run, items))
+        return [item for item, result in zip(items, results) if result is not True]
+
+    def _ensure_pool_size(self, connections):
+        """Enlarge the keep-alive pool of the connection to hold `connections` at once."""
+        if connections > self.connection.pool_size:
+            self.connection.pool_size = connections
+            self.connection.close()
+
+    def download(self, remote_path, local_path, resume=False, segments=1, workers=1):
+        """
+        Download file or directory, in resume mode continuing interrupted downloads, with
+        several segments fetching large files as concurrent byte ranges and with several
+        workers downloading the files of a directory concurrently. Returns True if everything
+        was downloaded.
+        """
         if not remote_path.startswith("/"):
             remote_path = "/" + remote_path
         if not remote_path.endswith("/"):
@@ -128,13 +377,21 @@ class WebDavClient:
         if len(directory_contents) == 1 and not directory_contents[0]['isDir']:
             local_path = os.path.abspath(local_path) + os.sep + directory_contents[0]['displayname']
             print(f'Downloading file {remote_path} to {local_path}')
-            self.download_file(remote_path, local_path)
+            node = directory_contents[0]
+            self._ensure_pool_size(segments)
+            downloaded = self.download_file(remote_path, local_path, node.get('etag'), resume,
+                                            node.get('length'), segments)
         else:
             local_path = os.path.abspath(local_path) + os.sep + \
                          remote_path.strip("/").split("/")[-1]
             print(f'Downloading directory {remote_path} to {local_path}')
-            self.download_directory(remote_path, local_path)
-        print('Download complete.')
+            downloaded = self.download_directory(remote_path, local_path, resume, segments,
+                                                 workers)
+        if downloaded:
+            print('Download complete.')
+        else:
+            print('Download finished with errors.')
+        return downloaded
 
     def list_directory(self, remote_path):
         """List files in remote path."""
@@ -148,28 +405,56 @@ class WebDavClient:
             return res
         return []
 
-    def list_directory_recursive(self, remote_path):
-        """List all files and directories in remote path recursively."""
+    def iter_directory(self, remote_path):
+        """
+        Yield the files and directories in remote path as the PROPFIND response streams in.
+
+        The multistatus body is parsed incrementally and every response element is dropped
+        once its node is built, so directories of any size are listed with constant memory.
+        Like `list_directory`, the first node is the directory itself.
+        """
         if not remote_path.startswith("/"):
             remote_path = "/" + remote_path
         if not remote_path.endswith("/"):
             remote_path += "/"
+        resp = self.connection.send_request("PROPFIND", remote_path,
+                                            add_headers={"Depth": "1"}, stream=True)
+        try:
+            if resp.status_code != 207:
+                return
+            resp.raw.decode_content = True
+            for _, element in Et.iterparse(resp.raw):
+                if element.tag == '{DAV:}response':
+                    yield self._parse_node(element)
+                    element.clear()
+        finally:
+            resp.close()
+
+    def iter_directory_recursive(self, remote_path, indent=""):
+        """
+        Yield (node, indent) pairs for all files and directories in remote path recursively,
+        in the order of `list_directory_recursive`.
 
-        def process_directory(directory_path, indent=""):
-            directory_contents = self.list_directory(directory_path)
-            contents = []
-            for file in directory_contents:
-                if file['isDir'] and file['path'].strip('/') != directory_path.strip('/'):
-                    contents.extend(process_directory(file['path'], indent + "\t"))
-                else:
-                    contents.append((file, indent))
-            return contents
+        Subdirectories are descended into as soon as they are parsed, while the listing of
+        their parent stays open, so only one streamed listing per level is held at a time.
+        """
+        for node in self.iter_directory(remote_path):
+            if node['isDir'] and node['path'].strip('/') != remote_path.strip('/'):
+                yield from self.iter_directory_recursive(node['path'], indent + "\t")
+            else:
+                yield node, indent
 
-        base_contents = process_directory(remote_path)
+    def list_directory_recursive(self, remote_path):
+        """
+        List all files and directories in remote path recursively.
 
-        if len(base_contents) == 0:
-            print(f'File/directory {remote_path} not found')
-            exit()
+        Entries are printed as they are received. The nodes are also returned, for a large
+        tree `iter_directory_recursive` lists without keeping them.
+        """
+        if not remote_path.startswith("/"):
+            remote_path = "/" + remote_path
+        if not remote_path.endswith("/"):
+            remote_path += "/"
 
         def format_listing(listing, indent):
             if listing['isDir']:
@@ -177,31 +462,37 @@ class WebDavClient:
             return "{}{} ({} bytes)" \
                 .format(indent + "\t", listing['displayname'], listing['length'])
 
-        for item, offset in base_contents:
+        base_contents = []
+        for item, offset in self.iter_directory_recursive(remote_path):
             print(format_listing(item, offset))
-        base_contents = [item for item, offset in base_contents]
+            base_contents.append(item)
+
+        if len(base_contents) == 0:
+            print(f'File/directory {remote_path} not found')
+            exit()
         return base_contents
 
     def parse_list(self, xml):
-        result = []
-        root = Et.fromstring(xml)
-        for response in root.findall('.//d:response', namespaces=self.namespaces):
-            node = {
-                'path': response.find("d:href", namespaces=self.namespaces).text,
-                'displayname': response.find("d:propstat/d:prop/d:displayname",
-                                             namespaces=self.namespaces).text,
-                'isDir': response.find("d:propstat/d:prop/d:resourcetype/d:collection",
-                                       namespaces=self.namespaces) is not None
-            }
-            if not node['isDir']:
-                node['length'] = response.find("d:propstat/d:prop/d:getcontentlength",
-                                               namespaces=self.namespaces).text
-                node['etag'] = response.find("d:propstat/d:prop/d:getetag",
-                                             namespaces=self.namespaces).text
-                node['type'] = response.find("d:propstat/d:prop/d:getcontenttype",
-                                             namespaces=self.namespaces).text
-            result.append(node)
-        return result
+        return [self._parse_node(response) for response in
+                Et.fromstring(xml).findall('.//d:response', namespaces=self.namespaces)]
+
+    def _parse_node(self, response):
+        """Build the node of one d:response element of a PROPFIND multistatus."""
+        node = {
+            'path': response.find("d:href", namespaces=self.namespaces).text,
+            'displayname': response.find("d:propstat/d:prop/d:displayname",
+                                         namespaces=self.namespaces).text,
+            'isDir': response.find("d:propstat/d:prop/d:resourcetype/d:collection",
+                                   namespaces=self.namespaces) is not None
+        }
+        if not node['isDir']:
+            node['length'] = response.find("d:propstat/d:prop/d:getcontentlength",
+                                           namespaces=self.namespaces).text
+            node['etag'] = response.find("d:propstat/d:prop/d:getetag",
+                                         namespaces=self.namespaces).text
+            node['type'] = response.find("d:propstat/d:prop/d:getcontenttype",
+                                         namespaces=self.namespaces).text
+        return node
 
     def make_directory(self, remote_directory):
         """Make remote directory."""